@@ -1,14 +1,22 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, Post, StoredFile
+from .search import filter_matching
 
 
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('text', 'pub_date', 'author')
+    list_display = ('text', 'pub_date', 'author', 'comment_count',
+                    'view_count')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту через FTS5 вместо LIKE '%...%'
+        if not search_term:
+            return queryset, False
+        return filter_matching(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug', 'description')
@@ -27,7 +35,15 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
 
 
+class StoredFileAdmin(admin.ModelAdmin):
+    list_display = ('name', 'refcount', 'similar_to')
+    search_fields = ('name',)
+    readonly_fields = ('thumbnails', 'similar_to')
+    empty_value_display = '-пусто-'
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(StoredFile, StoredFileAdmin)
@@ -0,0 +1,140 @@
+"""Read-only JSON API: ленты, пост и его комментарии.
+
+Ответ начинается с валидаторов: один лёгкий запрос берёт id, даты и
+версии строк страницы без текста и JOIN. Если клиент прислал совпавший
+If-None-Match, сразу уходит 304 — без основной выборки и сериализации.
+Сильный ETag держится на Post.version: её увеличивают правка поста и его
+группы, комментарии и миниатюры. Last-Modified не отдаётся: даты
+публикации не меняются от правок и удаления комментариев, и
+If-Modified-Since отвечал бы 304 на устаревшие данные.
+"""
+import hashlib
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+from .models import Comment, Group, Post, User
+from .paginator import CommentPaginator, CursorPaginator
+from .view_buffer import view_buffer
+from .views import get_client_ip
+
+POST_VALIDATOR_FIELDS = ('id', 'pub_date', 'version')
+
+
+def get_etag(rows, *extra):
+    """ETag по строкам (id, дата, версия) и прочим данным."""
+    digest = hashlib.sha1(repr((rows, extra)).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional(request, etag, respond):
+    """304 по ETag, иначе ответ respond() с ETag."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = respond()
+    response['ETag'] = etag
+    return response
+
+
+def group_data(group):
+    if group is None:
+        return None
+    return {'slug': group.slug, 'title': group.title}
+
+
+def post_data(post):
+    return {
+        'id': post.id,
+        'author': post.author.username,
+        'group': group_data(post.group),
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'image': post.image.url if post.image else None,
+        'comment_count': post.comment_count,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def page_data(page, serialize):
+    return {'results': [serialize(obj) for obj in page],
+            'next_cursor': page.next_cursor,
+            'previous_cursor': page.previous_cursor}
+
+
+def feed_response(request, posts, extra=None):
+    """Страница ленты posts; extra — данные шапки (группа, автор)."""
+    cursor = request.GET.get('cursor')
+    paginator = CursorPaginator(posts.feed(), settings.PAGINATOR_YA)
+    rows = paginator.peek(cursor, *POST_VALIDATOR_FIELDS)
+
+    def respond():
+        data = page_data(paginator.get_page(cursor), post_data)
+        return JsonResponse({**(extra or {}), **data})
+    return conditional(request, get_etag(rows, extra), respond)
+
+
+@require_safe
+def index(request):
+    return feed_response(request, Post.objects.all())
+
+
+@require_safe
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    extra = {'group': {**group_data(group),
+                       'description': group.description}}
+    return feed_response(request, group.posts.all(), extra)
+
+
+@require_safe
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.only('username', 'first_name', 'last_name'),
+        username=username)
+    extra = {'author': {'username': author.username,
+                        'full_name': author.get_full_name()}}
+    return feed_response(request, author.posts.all(), extra)
+
+
+@require_safe
+def post_view(request, post_id):
+    row = (Post.objects.filter(id=post_id)
+           .values_list(*POST_VALIDATOR_FIELDS).first())
+    if row is None:
+        raise Http404('Пост не найден')
+    view_buffer.record(post_id, get_client_ip(request))
+
+    def respond():
+        post = Post.objects.feed().get(id=post_id)
+        return JsonResponse(post_data(post))
+    return conditional(request, get_etag([row]), respond)
+
+
+@require_safe
+def comments(request, post_id):
+    version = (Post.objects.filter(id=post_id)
+               .values_list('version', flat=True).first())
+    if version is None:
+        raise Http404('Пост не найден')
+    cursor = request.GET.get('cursor')
+    paginator = CommentPaginator(
+        Comment.objects.filter(post_id=post_id).thread(),
+        settings.COMMENTS_PAGE_SIZE)
+    # Удаление комментария тоже увеличивает версию поста
+    rows = paginator.peek(cursor, 'id', 'created')
+
+    def respond():
+        return JsonResponse(page_data(paginator.get_page(cursor),
+                                      comment_data))
+    return conditional(request, get_etag(rows, version), respond)
@@ -0,0 +1,101 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from .models import Group, User
+from .page_cache import get_generations, model_scope
+
+
+class PrefixIndex:
+    """Префиксный поиск по отсортированному в памяти массиву через bisect.
+
+    Записи (ключ в casefold, pk, значения полей) лежат по возрастанию,
+    поэтому поиск — бинарный поиск начала диапазона и проход по нему без
+    обращений к базе. Сигналы правят индекс на месте; если модель менял
+    другой процесс (поколение модели в кеше ушло вперёд больше чем на
+    единицу), индекс перечитывается целиком. Поколение поиск сверяет не
+    чаще раза в AUTOCOMPLETE_CHECK_INTERVAL секунд: общий кеш может быть
+    базой, а нажатие клавиши не должно стоить запроса.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.entries = []
+        self.by_pk = {}
+        self.generation = None
+        self.checked = None
+        self.lock = threading.Lock()
+
+    def current_generation(self):
+        generation, = get_generations([model_scope(self.model)])
+        return generation
+
+    def load(self, generation=None):
+        # Поколение берётся до чтения: запись во время загрузки
+        # приведёт к повторной загрузке, а не потеряется
+        if generation is None:
+            generation = self.current_generation()
+        checked = time.monotonic()
+        rows = self.model.objects.values_list('pk', *self.fields).iterator()
+        entries = sorted((values[0].casefold(), pk, values)
+                         for pk, *values in rows)
+        with self.lock:
+            self.entries = entries
+            self.by_pk = {entry[1]: entry for entry in entries}
+            self.generation = generation
+            self.checked = checked
+
+    def _discard(self, pk):
+        entry = self.by_pk.pop(pk, None)
+        if entry is not None:
+            del self.entries[bisect_left(self.entries, entry)]
+
+    def sync(self, instance, deleted=False):
+        generation = self.current_generation()
+        with self.lock:
+            if self.generation is None:
+                return
+            if generation != self.generation + 1:
+                self.generation = None
+                return
+            self._discard(instance.pk)
+            if not deleted:
+                values = [getattr(instance, field) for field in self.fields]
+                entry = (values[0].casefold(), instance.pk, values)
+                insort(self.entries, entry)
+                self.by_pk[instance.pk] = entry
+            self.generation = generation
+
+    def is_due(self):
+        return self.generation is None or (
+            time.monotonic() - self.checked
+            >= settings.AUTOCOMPLETE_CHECK_INTERVAL)
+
+    def search(self, prefix, limit):
+        if self.is_due():
+            generation = self.current_generation()
+            if generation == self.generation:
+                self.checked = time.monotonic()
+            else:
+                self.load(generation)
+        prefix = prefix.casefold()
+        found = []
+        with self.lock:
+            index = bisect_left(self.entries, (prefix,))
+            for key, pk, values in self.entries[index:index + limit]:
+                if not key.startswith(prefix):
+                    break
+                found.append(dict(zip(self.fields, values)))
+        return found
+
+
+users = PrefixIndex(User, ('username',))
+groups = PrefixIndex(Group, ('title', 'slug'))
+
+
+def warm():
+    users.load()
+    groups.load()
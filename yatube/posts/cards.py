@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+
+def card_key(post):
+    # pub_date в ключе: SQLite может выдать id удалённого поста новому
+    stamp = int(post.pub_date.timestamp() * 1000000)
+    return f'post_card:{post.id}:{stamp}:{post.version}'
+
+
+def render_card(post):
+    return render_to_string('includes/post_card.html', {'post': post})
+
+
+def get_card(post):
+    key = card_key(post)
+    html = cache.get(key)
+    if html is None:
+        html = render_card(post)
+        cache.set(key, html, settings.POST_CARD_CACHE_TIMEOUT)
+    return html
+
+
+def attach_cards(posts):
+    """Достаёт карточки страницы одним get_many и дорисовывает промахи."""
+    by_key = {card_key(post): post for post in posts}
+    cached = cache.get_many(by_key)
+    missing = {}
+    for key, post in by_key.items():
+        html = cached.get(key)
+        if html is None:
+            html = missing[key] = render_card(post)
+        post.card_html = html
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return posts
@@ -0,0 +1,56 @@
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .models import Follow
+from .page_cache import shared_cache
+
+TYPECODE = 'q'
+
+
+def following_key(user_id):
+    return f'follow_graph:{user_id}'
+
+
+def get_following(user_id):
+    """Отсортированный array id авторов, на которых подписан пользователь.
+
+    В кеше лежат сырые байты массива: 8 байт на подписку вместо
+    сериализованного множества объектов int. Кеш общий для процессов:
+    подписку сбрасывает тот воркер, что её обработал, а кнопка
+    «Подписаться» в других воркерах не должна устаревать.
+    """
+    key = following_key(user_id)
+    shared = shared_cache()
+    data = shared.get(key)
+    following = array(TYPECODE)
+    if data is None:
+        following.extend(sorted(Follow.objects.filter(user_id=user_id)
+                                .values_list('author_id', flat=True)))
+        shared.set(key, following.tobytes(), settings.FOLLOW_GRAPH_TIMEOUT)
+    else:
+        following.frombytes(data)
+    return following
+
+
+def invalidate(*user_ids):
+    shared_cache().delete_many([following_key(user_id)
+                                for user_id in user_ids])
+
+
+def following_status(user, author_ids):
+    """{author_id: подписан ли user} для целой страницы за одно чтение кеша."""
+    if not user.is_authenticated:
+        return dict.fromkeys(author_ids, False)
+    following = get_following(user.pk)
+    size = len(following)
+    status = {}
+    for author_id in author_ids:
+        index = bisect_left(following, author_id)
+        status[author_id] = index < size and following[index] == author_id
+    return status
+
+
+def is_following(user, author_id):
+    return following_status(user, [author_id])[author_id]
@@ -1,6 +1,10 @@
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.forms import ModelForm
+from PIL import Image
 
+from .images import check_pixels
 from .models import Comment, Post, Group
 
 
@@ -16,6 +20,21 @@ class PostForm(ModelForm):
                   'image': 'Загрузите картинку'}
         widgets = {'text': forms.Textarea()}
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        # ImageField прочитал только заголовок (verify() пиксели не
+        # распаковывает), поэтому отказ здесь — ещё до декодирования
+        opened = getattr(image, 'image', None)
+        if opened is not None:
+            try:
+                check_pixels(opened.size, settings.IMAGE_MAX_PIXELS)
+            except Image.DecompressionBombError:
+                raise ValidationError(
+                    'Картинка больше %(limit)s Мп, уменьшите её.',
+                    code='too_many_pixels',
+                    params={'limit': settings.IMAGE_MAX_PIXELS // 10 ** 6})
+        return image
+
 
 class GroupForm(forms.ModelForm):
     class Meta:
@@ -23,6 +42,21 @@ class GroupForm(forms.ModelForm):
         fields = ('title', 'slug', 'description')
 
 
+class ExportForm(forms.Form):
+    """Параметры выгрузки: для запроса и для команды export_posts."""
+    format = forms.ChoiceField(choices=(('ndjson', 'NDJSON'),
+                                        ('csv', 'CSV')),
+                               required=False)
+    author = forms.CharField(required=False)
+    group = forms.SlugField(required=False)
+    since = forms.DateTimeField(required=False)
+    until = forms.DateTimeField(required=False)
+    gzip = forms.BooleanField(required=False)
+
+    def clean_format(self):
+        return self.cleaned_data['format'] or 'ndjson'
+
+
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
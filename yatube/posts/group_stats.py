@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import (Count, DateTimeField, F, IntegerField, OuterRef,
+                              Subquery, Value)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Group, GroupStats, Post
+
+
+def active_since():
+    return timezone.now() - timedelta(days=settings.GROUP_ACTIVE_DAYS)
+
+
+def count_active_authors(group_id):
+    return (Post.objects.filter(group_id=group_id,
+                                pub_date__gte=active_since())
+            .order_by().values('author').distinct().count())
+
+
+def latest_post_date():
+    return Subquery(Post.objects.filter(group=OuterRef('group'))
+                    .order_by('-pub_date').values('pub_date')[:1])
+
+
+def post_added(post):
+    posts_added(post.group_id, 1, post.pub_date)
+
+
+def posts_added(group_id, count, latest):
+    """count новых постов сообщества, самый свежий — от latest."""
+    pub_date = Value(latest, output_field=DateTimeField())
+    updated = GroupStats.objects.filter(group_id=group_id).update(
+        post_count=F('post_count') + count,
+        last_post_date=Greatest(Coalesce('last_post_date', pub_date),
+                                pub_date),
+        active_authors=count_active_authors(group_id))
+    if not updated:
+        refresh([group_id])
+
+
+def post_removed(group_id):
+    GroupStats.objects.filter(group_id=group_id).update(
+        post_count=Greatest(F('post_count') - 1, 0),
+        last_post_date=latest_post_date(),
+        active_authors=count_active_authors(group_id))
+
+
+def refresh(group_ids=None):
+    """Пересчитывает сводки с нуля: окно активных авторов сдвигается со
+    временем, поэтому её стоит запускать по расписанию."""
+    groups = Group.objects.all()
+    if group_ids is not None:
+        groups = groups.filter(id__in=group_ids)
+    missing = groups.filter(stats__isnull=True).values_list('id', flat=True)
+    GroupStats.objects.bulk_create(
+        GroupStats(group_id=group_id) for group_id in missing)
+    posts = Post.objects.filter(group=OuterRef('group')).order_by()
+    totals = posts.values('group').annotate(total=Count('*'))
+    authors = (posts.filter(pub_date__gte=active_since()).values('group')
+               .annotate(total=Count('author', distinct=True)))
+    stats = GroupStats.objects.all()
+    if group_ids is not None:
+        stats = stats.filter(group_id__in=group_ids)
+    return stats.update(
+        post_count=Coalesce(Subquery(totals.values('total'),
+                                     output_field=IntegerField()), 0),
+        last_post_date=latest_post_date(),
+        active_authors=Coalesce(Subquery(authors.values('total'),
+                                         output_field=IntegerField()), 0))
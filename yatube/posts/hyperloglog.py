@@ -0,0 +1,61 @@
+import hashlib
+import math
+
+HASH_BITS = 64
+
+
+class HyperLogLog:
+    """Оценка числа уникальных значений в 2**precision байтах.
+
+    Относительная ошибка около 1.04 / sqrt(2**precision); при precision=12
+    скетч занимает 4 КБ и ошибается примерно на 1.6%. Скетчи одной точности
+    объединяются поразрядным максимумом, поэтому итог по автору или группе
+    получается слиянием скетчей их постов.
+    """
+
+    def __init__(self, precision=12, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers or self.size)
+        if len(self.registers) != self.size:
+            raise ValueError('Размер регистров не совпадает с точностью')
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(int(math.log2(len(data))), data)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        tail_bits = HASH_BITS - self.precision
+        index = hashed >> tail_bits
+        tail = hashed & ((1 << tail_bits) - 1)
+        rank = tail_bits - tail.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('Нельзя объединить скетчи разной точности')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        size = self.size
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / math.fsum(
+            2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(size / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
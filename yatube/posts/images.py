@@ -0,0 +1,150 @@
+"""Кодирование вариантов картинки поста.
+
+Функции получают и возвращают байты, не трогают Django и поэтому
+выполняются в процессах пула (posts.thumbnails).
+"""
+import struct
+from io import BytesIO
+from math import ceil
+
+from PIL import Image, ImageOps
+
+MIME_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+# EXIF-ориентации с поворотом на 90°: ширина и высота меняются местами
+ROTATED = (5, 6, 7, 8)
+ORIENTATION = 0x0112
+# Сегменты JPEG с метаданными: APP1 (EXIF, XMP), APP13 (IPTC), COM.
+# APP0 (JFIF), APP2 (ICC-профиль) и APP14 (Adobe) нужны для цвета
+METADATA_MARKERS = (0xE1, 0xED, 0xFE)
+START_OF_SCAN = 0xDA
+
+
+def crop_box(size, aspect):
+    """Центральная область исходника с соотношением сторон aspect."""
+    width, height = size
+    ratio = aspect[0] / aspect[1]
+    if width / height > ratio:
+        crop_width = round(height * ratio)
+        left = (width - crop_width) // 2
+        return left, 0, left + crop_width, height
+    crop_height = round(width / ratio)
+    top = (height - crop_height) // 2
+    return 0, top, width, top + crop_height
+
+
+def check_pixels(size, max_pixels):
+    """Отказ по размерам из заголовка, до декодирования пикселей."""
+    if max_pixels and size[0] * size[1] > max_pixels:
+        raise Image.DecompressionBombError(
+            f'{size[0]}x{size[1]}: больше {max_pixels} пикселей')
+
+
+def draft_size(image, width, height, aspect):
+    """Наименьший размер декодирования, из которого ещё режется кадр."""
+    size = image.size
+    if image.getexif().get(ORIENTATION) in ROTATED:
+        size = size[::-1]
+    left, top, right, bottom = crop_box(size, aspect)
+    scale = min(1, max(width / (right - left), height / (bottom - top)))
+    return ceil(image.size[0] * scale), ceil(image.size[1] * scale)
+
+
+def encode_variants(data, width, aspect, formats, quality, draft=True):
+    """[(формат, байты, ширина, высота)] кадра шириной width.
+
+    JPEG декодируется в draft-режиме сразу уменьшенным в 2, 4 или 8 раз,
+    насколько позволяет width: 480w из 40 Мп занимает в памяти ~1 Мп.
+    """
+    height = round(width * aspect[1] / aspect[0])
+    with Image.open(BytesIO(data)) as image:
+        if draft:
+            image.draft('RGB', draft_size(image, width, height, aspect))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        frame = image.resize((width, height), Image.LANCZOS,
+                             box=crop_box(image.size, aspect))
+    variants = []
+    for image_format in formats:
+        buffer = BytesIO()
+        frame.save(buffer, image_format.upper(), quality=quality,
+                   optimize=image_format == 'jpeg', progressive=True)
+        variants.append((image_format, buffer.getvalue(), width, height))
+    return variants
+
+
+def image_size(data):
+    """Размеры по заголовку, без декодирования, с учётом ориентации."""
+    with Image.open(BytesIO(data)) as image:
+        if image.getexif().get(ORIENTATION) in ROTATED:
+            return image.size[::-1]
+        return image.size
+
+
+def difference_hash(data, size=8):
+    """64-битный dHash: почти не меняется от пережатия и масштаба."""
+    with Image.open(BytesIO(data)) as image:
+        image.draft('L', (size * 8, size * 8))
+        gray = image.convert('L').resize((size + 1, size), Image.LANCZOS)
+    pixels = list(gray.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            bits = bits << 1 | (left > pixels[row * (size + 1) + col + 1])
+    return bits
+
+
+def orientation_segment(exif):
+    """APP1 только с ориентацией из EXIF-сегмента exif, иначе b''."""
+    parsed = Image.Exif()
+    try:
+        parsed.load(exif)
+    except Exception:
+        return b''
+    orientation = parsed.get(ORIENTATION)
+    if orientation in (None, 1):
+        return b''
+    kept = Image.Exif()
+    kept[ORIENTATION] = orientation
+    payload = kept.tobytes()
+    return struct.pack('>HH', 0xFFE1, len(payload) + 2) + payload
+
+
+def fill(buffer, chunks, size):
+    """Дочитывает buffer до size байтов; False, если поток кончился."""
+    while len(buffer) < size:
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        buffer += chunk
+    return True
+
+
+def strip_metadata(chunks):
+    """Поток байтов JPEG без EXIF, XMP, IPTC и комментариев.
+
+    Сегменты заголовка разбираются по одному, пока не начнутся данные
+    скана, дальше куски идут как есть: в памяти не больше одного сегмента
+    (до 64 КБ). Из EXIF остаётся только ориентация, иначе снимок с
+    телефона повернётся. Не-JPEG и непонятный заголовок не меняются.
+    """
+    chunks = iter(chunks)
+    buffer = bytearray()
+    if not fill(buffer, chunks, 2) or buffer[:2] != b'\xff\xd8':
+        yield bytes(buffer)
+        yield from chunks
+        return
+    yield bytes(buffer[:2])
+    del buffer[:2]
+    while fill(buffer, chunks, 4):
+        marker, length = buffer[1], struct.unpack('>H', buffer[2:4])[0]
+        if (buffer[0] != 0xFF or marker in (0xFF, START_OF_SCAN)
+                or length < 2 or not fill(buffer, chunks, length + 2)):
+            break
+        segment = bytes(buffer[:length + 2])
+        del buffer[:length + 2]
+        if marker == 0xE1 and segment[4:10] == b'Exif\x00\x00':
+            yield orientation_segment(segment[4:])
+        elif marker not in METADATA_MARKERS:
+            yield segment
+    yield bytes(buffer)
+    yield from chunks
@@ -0,0 +1,339 @@
+"""Массовый импорт постов, комментариев и подписок (import_posts).
+
+Записи идут пачками: авторы и сообщества ищутся по картам в памяти,
+строки пишутся многострочными вставками в одной транзакции с точкой
+продолжения. Сигналы при этом не срабатывают, поэтому всё, что они
+ведут, — ленты, поисковый индекс, счётчики, сводки сообществ,
+популярность и поколения кеша, — importer обновляет сам, пачкой на пачку.
+"""
+import csv
+import json
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from datetime import datetime
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import follow_graph, group_stats, page_cache, search, timeline
+from . import trending
+from .models import (Comment, Follow, Group, GroupStats, ImportCheckpoint,
+                     Post, User, UserStats)
+
+FIELDS = ('type', 'id', 'author', 'group', 'group_title', 'text',
+          'pub_date', 'post', 'user')
+BATCH_SIZE = 10000
+CACHE_KIB = 256 * 1024
+
+
+def read_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(file):
+    for row in csv.DictReader(file):
+        yield {key: value for key, value in row.items() if value}
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+@lru_cache(maxsize=None)
+def utc_offset(hour):
+    """Смещение текущей зоны в наивный час: pytz.localize на каждую
+    запись занимал четверть времени импорта."""
+    return timezone.make_aware(hour).utcoffset()
+
+
+def parse_date(value):
+    """Дата записи в UTC; без зоны — в текущей зоне, как в формах."""
+    if not value:
+        return timezone.now()
+    try:
+        date = datetime.fromisoformat(value)
+    except ValueError:
+        # parse_datetime медленнее, но понимает и «Z» на конце
+        date = parse_datetime(value)
+        if date is None:
+            raise
+    if timezone.is_naive(date):
+        offset = utc_offset(date.replace(minute=0, second=0, microsecond=0))
+        return (date - offset).replace(tzinfo=timezone.utc)
+    return date.astimezone(timezone.utc)
+
+
+def db_date(date):
+    """Значение DateTimeField для SQLite: наивное время UTC строкой."""
+    return str(date.replace(tzinfo=None))
+
+
+def clean_post(record):
+    """(автор, сообщество, текст, дата) или None для негодной записи.
+
+    Зависит только от самой записи: при продолжении импорта посты
+    нумеруются заново и должны получить те же номера.
+    """
+    if not record.get('author') or not record.get('text'):
+        return None
+    try:
+        pub_date = parse_date(record.get('pub_date'))
+    except ValueError:
+        return None
+    return record['author'], record.get('group'), record['text'], pub_date
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def insert(model, fields, rows):
+    """Вставка строк одним executemany, без экземпляров моделей.
+
+    bulk_create готовит каждое значение через поле модели и в SQLite
+    пишет не больше 999 параметров за запрос: на сотнях тысяч строк это
+    почти всё время импорта. Значения должны быть уже в виде для базы.
+    """
+    columns = ', '.join(connection.ops.quote_name(
+        model._meta.get_field(field).column) for field in fields)
+    values = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {model._meta.db_table} ({columns}) '
+            f'VALUES ({values})', rows)
+
+
+def add_to(model, key, field, counts):
+    """Прибавляет counts[id] к счётчику field строк model одним executemany."""
+    column = model._meta.get_field(field).column
+    key = model._meta.get_field(key).column
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {model._meta.db_table} SET {column} = {column} + %s '
+            f'WHERE {key} = %s',
+            [(delta, pk) for pk, delta in counts.items()])
+
+
+class Importer:
+    """Импорт одного источника с продолжением с последней пачки."""
+
+    def __init__(self, source, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=source)
+        self.segments = json.loads(self.checkpoint.post_ids)
+        self.users = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        # Внешний id поста -> id в базе, для комментариев
+        self.posts = {}
+        self.counts = Counter()
+        if connection.vendor == 'sqlite':
+            # Индексы постов и лент крупнее кеша страниц по умолчанию
+            # (2 МБ): с большим кешем вставка в них быстрее на 15–20%
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA cache_size = -{CACHE_KIB}')
+
+    def post_id(self, number):
+        index = bisect_right(self.segments, [number, float('inf')]) - 1
+        start, first_id = self.segments[index]
+        return first_id + number - start
+
+    def run(self, records):
+        """Импортирует записи; после каждой пачки отдаёт позицию."""
+        done = self.checkpoint.position
+        numbers = 0
+        batch = []
+        for position, record in enumerate(records, 1):
+            if position <= done:
+                # Уже импортировано: только восстановить карту id постов
+                if record.get('type') == 'post' and clean_post(record):
+                    if 'id' in record:
+                        self.posts[str(record['id'])] = self.post_id(numbers)
+                    numbers += 1
+                continue
+            batch.append(record)
+            if len(batch) == self.batch_size:
+                numbers = self.save_batch(batch, position, numbers)
+                batch = []
+                yield position
+        if batch:
+            self.save_batch(batch, position, numbers)
+            yield position
+
+    def save_batch(self, records, position, numbers):
+        by_type = defaultdict(list)
+        for record in records:
+            by_type[record.get('type')].append(record)
+        self.counts['skipped'] += sum(
+            len(rows) for kind, rows in by_type.items()
+            if kind not in ('post', 'comment', 'follow'))
+        scopes = set()
+        with transaction.atomic():
+            # Первая запись берёт блокировку базы: Max('id') ниже не
+            # изменится до коммита, и id новых строк можно задать самим
+            ImportCheckpoint.objects.filter(id=self.checkpoint.id).update(
+                position=position)
+            self.add_users(records)
+            followers = self.add_follows(by_type['follow'], scopes)
+            numbers = self.add_posts(by_type['post'], numbers, scopes)
+            self.add_comments(by_type['comment'], scopes)
+            self.checkpoint.position = position
+            ImportCheckpoint.objects.filter(id=self.checkpoint.id).update(
+                post_ids=json.dumps(self.segments))
+        for user_id in followers:
+            follow_graph.invalidate(user_id)
+        page_cache.bump(*scopes, *(page_cache.model_scope(model) for model in
+                                   (User, Group, GroupStats, Post)))
+        return numbers
+
+    def add_users(self, records):
+        names = {record[key] for record in records
+                 for key in ('author', 'user') if record.get(key)}
+        missing = names - self.users.keys()
+        if not missing:
+            return
+        # Пароль непригоден для входа: пользователь восстановит его сам
+        User.objects.bulk_create(
+            User(username=name, password=make_password(None))
+            for name in missing)
+        created = dict(User.objects.filter(username__in=missing)
+                       .values_list('username', 'id'))
+        UserStats.objects.bulk_create(
+            UserStats(user_id=user_id) for user_id in created.values())
+        self.users.update(created)
+        self.counts['users'] += len(created)
+
+    def add_groups(self, posts):
+        titles = {}
+        for record in posts:
+            slug = record.get('group')
+            if slug and slug not in self.groups:
+                titles[slug] = record.get('group_title') or slug
+        if not titles:
+            return
+        Group.objects.bulk_create(
+            Group(slug=slug, title=title, description='')
+            for slug, title in titles.items())
+        created = dict(Group.objects.filter(slug__in=titles)
+                       .values_list('slug', 'id'))
+        GroupStats.objects.bulk_create(
+            GroupStats(group_id=group_id) for group_id in created.values())
+        self.groups.update(created)
+        self.counts['groups'] += len(created)
+
+    def add_follows(self, records, scopes):
+        pairs = {}
+        for record in records:
+            user, author = record.get('user'), record.get('author')
+            if user and author and user != author:
+                pairs[self.users[user], self.users[author]] = user, author
+        if pairs:
+            existing = set(Follow.objects.filter(
+                user_id__in={user_id for user_id, _ in pairs})
+                .values_list('user', 'author'))
+            for pair in existing & pairs.keys():
+                del pairs[pair]
+        self.counts['skipped'] += len(records) - len(pairs)
+        if not pairs:
+            return set()
+        first_id = next_id(Follow)
+        insert(Follow, ('id', 'user', 'author'),
+               [(follow_id, user_id, author_id) for follow_id, (
+                   user_id, author_id) in enumerate(pairs, first_id)])
+        # До вставки постов пачки: их разложит fan_out_many
+        timeline.backfill_many(first_id, first_id + len(pairs) - 1)
+        add_to(UserStats, 'user', 'following_count',
+               Counter(user_id for user_id, _ in pairs))
+        add_to(UserStats, 'user', 'follower_count',
+               Counter(author_id for _, author_id in pairs))
+        scopes.update(f'profile:{name}' for names in pairs.values()
+                      for name in names)
+        self.counts['follows'] += len(pairs)
+        return {user_id for user_id, _ in pairs}
+
+    def add_posts(self, records, numbers, scopes):
+        self.add_groups(records)
+        posts = []
+        for record in records:
+            cleaned = clean_post(record)
+            if cleaned is None:
+                self.counts['skipped'] += 1
+                continue
+            posts.append((record.get('id'), *cleaned))
+        if not posts:
+            return numbers
+        first_id = next_id(Post)
+        if not self.segments or self.post_id(numbers) != first_id:
+            self.segments.append([numbers, first_id])
+        rows, authors, groups = [], Counter(), defaultdict(list)
+        for post_id, (external_id, author, group, text, pub_date) in (
+                enumerate(posts, first_id)):
+            if external_id is not None:
+                self.posts[str(external_id)] = post_id
+            author_id, group_id = self.users[author], self.groups.get(group)
+            score = trending.event_score(settings.TRENDING_POST_WEIGHT,
+                                         pub_date)
+            rows.append((post_id, author_id, group_id, text, db_date(pub_date),
+                         0, 0, 0, score, ''))
+            authors[author_id] += 1
+            if group_id is not None:
+                groups[group_id].append(pub_date)
+        insert(Post, ('id', 'author', 'group', 'text', 'pub_date',
+                      *Post.COUNTER_FIELDS), rows)
+        last_id = first_id + len(rows) - 1
+        search.index_posts([(row[0], row[3]) for row in rows])
+        timeline.fan_out_many(first_id, last_id)
+        add_to(UserStats, 'user', 'post_count', authors)
+        for group_id, dates in groups.items():
+            group_stats.posts_added(group_id, len(dates), max(dates))
+        scopes.update(('index', 'groups'),
+                      {f'profile:{post[1]}' for post in posts},
+                      {f'group:{post[2]}' for post in posts if post[2]})
+        self.counts['posts'] += len(rows)
+        return numbers + len(rows)
+
+    def add_comments(self, records, scopes):
+        rows, events = [], defaultdict(list)
+        for record in records:
+            post_id = self.posts.get(str(record.get('post')))
+            try:
+                created = parse_date(record.get('pub_date'))
+            except ValueError:
+                post_id = None
+            if post_id is None or not record.get('author'):
+                self.counts['skipped'] += 1
+                continue
+            rows.append((post_id, self.users[record['author']],
+                         record.get('text', ''), db_date(created)))
+            events[post_id].append(trending.event_score(
+                settings.TRENDING_COMMENT_WEIGHT, created))
+        if not rows:
+            return
+        insert(Comment, ('post', 'author', 'text', 'created'), rows)
+        posts = (Post.objects.filter(id__in=events)
+                 .values_list('id', 'trending_score', 'author',
+                              'author__username', 'group__slug'))
+        updates, received = [], Counter()
+        for post_id, score, author_id, username, slug in posts:
+            # Счёт пересчитывается здесь: строку держит блокировка пачки
+            updates.append((len(events[post_id]),
+                            trending.log_sum([score, *events[post_id]]),
+                            post_id))
+            received[author_id] += len(events[post_id])
+            scopes.add(f'profile:{username}')
+            if slug:
+                scopes.add(f'group:{slug}')
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {Post._meta.db_table} SET '
+                'comment_count = comment_count + %s, version = version + 1, '
+                'trending_score = %s WHERE id = %s', updates)
+        add_to(UserStats, 'user', 'comments_received', received)
+        scopes.add('index')
+        self.counts['comments'] += len(rows)
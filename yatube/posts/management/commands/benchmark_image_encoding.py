@@ -0,0 +1,126 @@
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from posts.images import encode_variants
+
+
+def make_photo(width, height, seed):
+    """Фрактал с лёгким шумом: крупные формы и зерно, как у фотографии."""
+    extent = (-2.0 + seed * 0.05, -1.2, 1.0, 1.2)
+    shape = Image.effect_mandelbrot((width, height), extent, 60 + seed)
+    color = Image.merge('RGB', (shape, shape.rotate(180), shape.transpose(
+        Image.FLIP_LEFT_RIGHT)))
+    noise = Image.effect_noise((width, height), 24).convert('RGB')
+    photo = Image.blend(color, noise, 0.15)
+    buffer = BytesIO()
+    photo.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def peak_rss():
+    """Пиковая RSS процесса в КБ (VmHWM, только Linux)."""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+
+
+def peak_memory(data, widths, args, draft):
+    """Прирост пиковой RSS (МБ) на варианты одной загрузки."""
+    before = peak_rss()
+    for width in widths:
+        encode_variants(data, width, *args, draft=draft)
+    return (peak_rss() - before) / 1024
+
+
+class Command(BaseCommand):
+    help = ('Замеряет кодирование вариантов картинок (ширины x форматы) '
+            'последовательно и в пуле процессов, и пик памяти на большом '
+            'снимке с draft-режимом и без')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=8)
+        parser.add_argument('--width', type=int, default=3000)
+        parser.add_argument('--height', type=int, default=2000)
+        parser.add_argument('--processes', type=int,
+                            default=multiprocessing.cpu_count())
+        parser.add_argument('--memory-megapixels', type=int, default=40,
+                            help='размер снимка для замера пика памяти')
+
+    def measure_memory(self, megapixels):
+        width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+        photo = make_photo(width, width * 2 // 3, 0)
+        args = (settings.POST_IMAGE_ASPECT, settings.POST_IMAGE_FORMATS,
+                settings.POST_IMAGE_QUALITY)
+        context = multiprocessing.get_context('spawn')
+        for label, draft in (('полное декодирование', False),
+                             ('draft-режим', True)):
+            # Каждый замер в свежем процессе: освобождённую память
+            # процесс не возвращает, и пик не вырос бы. ru_maxrss здесь
+            # не годится — он переживает exec и достался бы от родителя
+            with ProcessPoolExecutor(max_workers=1,
+                                     mp_context=context) as pool:
+                peak = pool.submit(peak_memory, photo,
+                                   settings.POST_IMAGE_WIDTHS, args,
+                                   draft).result()
+            self.stdout.write(
+                f'пик памяти на {megapixels} Мп, {label}: +{peak:.0f} МБ')
+
+    def encode(self, photos, pool):
+        args = (settings.POST_IMAGE_ASPECT, settings.POST_IMAGE_FORMATS,
+                settings.POST_IMAGE_QUALITY)
+        tasks = [(photo, width) for photo in photos
+                 for width in settings.POST_IMAGE_WIDTHS]
+        started = time.perf_counter()
+        if pool is None:
+            results = [encode_variants(photo, width, *args)
+                       for photo, width in tasks]
+        else:
+            results = list(pool.map(
+                encode_variants, *zip(*tasks),
+                *([arg] * len(tasks) for arg in args)))
+        return time.perf_counter() - started, results
+
+    def handle(self, *args, **options):
+        photos = [make_photo(options['width'], options['height'], seed)
+                  for seed in range(options['images'])]
+        megapixels = options['width'] * options['height'] / 1e6
+        runs = [('последовательно', None)]
+        if options['processes'] > 1:
+            pool = ProcessPoolExecutor(
+                max_workers=options['processes'],
+                mp_context=multiprocessing.get_context('spawn'))
+            # Прогрев: запуск процессов не должен попасть в замер
+            list(pool.map(abs, range(options['processes'])))
+            runs.append((f'{options["processes"]} процессов', pool))
+        for label, pool in runs:
+            seconds, results = self.encode(photos, pool)
+            self.stdout.write(
+                f'{label}: {seconds:.2f} с, '
+                f'{len(photos) / seconds:.1f} картинок/с, '
+                f'{len(photos) * megapixels / seconds:.1f} Мп/с')
+            if pool is not None:
+                pool.shutdown()
+        sizes = defaultdict(list)
+        for variants in results:
+            for image_format, content, width, _ in variants:
+                sizes[(width, image_format)].append(len(content))
+        # Было: один кадр 960w JPEG с качеством sorl по умолчанию (95)
+        before = [len(encode_variants(photo, 960, settings.POST_IMAGE_ASPECT,
+                                      ('jpeg',), 95)[0][1])
+                  for photo in photos]
+        self.stdout.write(
+            f'было, 960w jpeg q95: {sum(before) / len(before) / 1024:.0f} КБ')
+        for (width, image_format), values in sorted(sizes.items()):
+            self.stdout.write(
+                f'{width}w {image_format}: '
+                f'{sum(values) / len(values) / 1024:.0f} КБ в среднем')
+        if options['memory_megapixels']:
+            self.measure_memory(options['memory_megapixels'])
@@ -0,0 +1,92 @@
+import json
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.importer import BATCH_SIZE, Importer, read_ndjson
+from posts.models import Post, User
+
+
+def write_records(path, users, posts, comments, follows, seed):
+    """Синтетический источник: подписки, посты, затем комментарии."""
+    generator = random.Random(seed)
+    words = ('лето', 'город', 'кофе', 'книга', 'дорога', 'море', 'утро',
+             'работа', 'кино', 'музыка', 'снег', 'друзья')
+    with open(path, 'w', encoding='utf-8') as file:
+        for _ in range(follows):
+            user, author = generator.sample(range(users), 2)
+            file.write(json.dumps({'type': 'follow', 'user': f'user{user}',
+                                   'author': f'user{author}'}) + '\n')
+        for number in range(posts):
+            file.write(json.dumps({
+                'type': 'post', 'id': number,
+                'author': f'user{generator.randrange(users)}',
+                'group': f'group{generator.randrange(20)}',
+                'text': ' '.join(generator.choices(words, k=30)),
+                'pub_date': f'2024-{1 + number % 12:02d}-'
+                            f'{1 + number % 28:02d}T12:00:00',
+            }, ensure_ascii=False) + '\n')
+        for _ in range(comments):
+            file.write(json.dumps({
+                'type': 'comment', 'post': generator.randrange(posts),
+                'author': f'user{generator.randrange(users)}',
+                'text': ' '.join(generator.choices(words, k=8)),
+                'pub_date': '2025-01-01T12:00:00',
+            }, ensure_ascii=False) + '\n')
+    return posts + comments + follows
+
+
+class Command(BaseCommand):
+    help = ('Замеряет import_posts на синтетическом источнике во временной '
+            'базе SQLite и сравнивает с созданием постов по одному')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--baseline', type=int, default=1000,
+                            help='сколько постов создать через save()')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'import.ndjson')
+            rows = write_records(path, options['users'], options['posts'],
+                                 options['comments'], options['follows'],
+                                 options['seed'])
+            # Отдельная база-файл: импорт не трогает рабочую
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                directory, 'benchmark.sqlite3')
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.benchmark(path, rows, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def benchmark(self, path, rows, options):
+        importer = Importer(path, options['batch_size'])
+        started = time.perf_counter()
+        with open(path, encoding='utf-8') as file:
+            for _ in importer.run(read_ndjson(file)):
+                pass
+        seconds = time.perf_counter() - started
+        counts = ', '.join(f'{kind}: {count}'
+                           for kind, count in sorted(importer.counts.items()))
+        self.stdout.write(f'import_posts: {rows} записей за {seconds:.2f} с, '
+                          f'{rows / seconds:.0f} записей/с ({counts})')
+        if not options['baseline']:
+            return
+        author = User.objects.get(username='user0')
+        started = time.perf_counter()
+        for number in range(options['baseline']):
+            Post.objects.create(author=author, text=f'пост {number}')
+        seconds = time.perf_counter() - started
+        self.stdout.write(f'было, save() по одному: '
+                          f'{options["baseline"] / seconds:.0f} постов/с')
@@ -0,0 +1,45 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import build_graph, score, top_k
+
+
+class Command(BaseCommand):
+    help = ('Замеряет расчёт рекомендаций на синтетическом графе подписок '
+            'без базы данных')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000)
+        parser.add_argument('--edges', type=int, default=300000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        users, edges = options['users'], options['edges']
+        random = np.random.default_rng(options['seed'])
+        # Популярность авторов по степенному закону, как у реальных подписок
+        followers = random.integers(1, users + 1, edges)
+        authors = np.minimum(random.zipf(1.5, edges), users)
+        authors = (authors * 7919) % users + 1
+        keep = followers != authors
+        followers, authors = followers[keep], authors[keep]
+        timings = {}
+        started = time.perf_counter()
+        ids, graph = build_graph(followers, authors)
+        timings['матрица'] = time.perf_counter() - started
+        started = time.perf_counter()
+        scores = score(graph, settings.RECOMMENDATIONS_COFOLLOW_WEIGHT,
+                       settings.RECOMMENDATIONS_MAX_FOLLOWERS)
+        timings['оценки'] = time.perf_counter() - started
+        started = time.perf_counter()
+        rows, *_ = top_k(scores, settings.RECOMMENDATIONS_TOP_K)
+        timings['top-k'] = time.perf_counter() - started
+        self.stdout.write(
+            f'Пользователей: {len(ids)}, подписок: {graph.nnz}, '
+            f'кандидатов: {scores.nnz}, рекомендаций: {len(rows)}')
+        for stage, seconds in timings.items():
+            self.stdout.write(f'{stage}: {seconds:.2f} с')
+        self.stdout.write(self.style.SUCCESS(
+            f'Итого: {sum(timings.values()):.2f} с'))
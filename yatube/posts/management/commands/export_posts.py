@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import RECORDS, export
+from posts.forms import ExportForm
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты и комментарии в NDJSON или CSV потоком, '
+            'в формате import_posts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='файл или - для stdout')
+        parser.add_argument('--format', choices=('ndjson', 'csv'))
+        parser.add_argument('--type', nargs='+', choices=sorted(RECORDS),
+                            default=['posts', 'comments'], dest='kinds')
+        parser.add_argument('--author', help='имя пользователя')
+        parser.add_argument('--group', help='slug сообщества')
+        parser.add_argument('--since', help='не раньше, ГГГГ-ММ-ДД [ЧЧ:ММ]')
+        parser.add_argument('--until', help='раньше, ГГГГ-ММ-ДД [ЧЧ:ММ]')
+        parser.add_argument('--gzip', action='store_true')
+
+    def handle(self, *args, **options):
+        form = ExportForm({key: value for key, value in options.items()
+                           if value is not None})
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        filters = form.cleaned_data
+        chunks = export(options['kinds'], filters['format'], filters,
+                        filters['gzip'])
+        if options['output'] == '-':
+            self.write(sys.stdout.buffer, chunks)
+            return
+        with open(options['output'], 'wb') as file:
+            written = self.write(file, chunks)
+        self.stdout.write(self.style.SUCCESS(f'Выгружено байт: {written}'))
+
+    def write(self, file, chunks):
+        written = 0
+        for chunk in chunks:
+            file.write(chunk)
+            written += len(chunk)
+        return written
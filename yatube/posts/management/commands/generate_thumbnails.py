@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+class Command(BaseCommand):
+    help = 'Считает миниатюры постов, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='пересчитать и уже готовые миниатюры')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            posts = posts.filter(thumbnails='')
+        generated, encoded = 0, set()
+        for post_id, image in posts.values_list('id', 'image').iterator():
+            # Общий файл перекодируется один раз, остальные посты берут
+            # готовые варианты из StoredFile
+            generate(post_id, force=options['all'] and image not in encoded)
+            encoded.add(image)
+            generated += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры посчитаны для постов: {generated}'))
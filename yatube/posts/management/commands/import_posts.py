@@ -0,0 +1,46 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.importer import BATCH_SIZE, FIELDS, READERS, Importer
+from posts.models import ImportCheckpoint
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты, комментарии и подписки из NDJSON или CSV '
+            'пачками; повторный запуск продолжает с последней пачки. '
+            f'Поля записи: {", ".join(FIELDS)}; type — post, comment или '
+            'follow, комментарий ссылается на id поста из того же источника')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(READERS),
+                            help='по умолчанию — по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--source',
+                            help='имя точки продолжения, по умолчанию путь')
+        parser.add_argument('--restart', action='store_true',
+                            help='забыть точку продолжения и начать сначала')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        source = options['source'] or os.path.abspath(path)
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson')
+        if options['restart']:
+            ImportCheckpoint.objects.filter(source=source).delete()
+        importer = Importer(source, options['batch_size'])
+        started_at = importer.checkpoint.position
+        position = started_at
+        started = time.perf_counter()
+        with open(path, encoding='utf-8', newline='') as file:
+            for position in importer.run(READERS[file_format](file)):
+                self.stdout.write(f'Записей обработано: {position}')
+        seconds = time.perf_counter() - started
+        rows = position - started_at
+        counts = ', '.join(f'{kind}: {count}'
+                           for kind, count in sorted(importer.counts.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершён за {seconds:.1f} с '
+            f'({rows / max(seconds, 1e-9):.0f} записей/с); {counts or "-"}'))
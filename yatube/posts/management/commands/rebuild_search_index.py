@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = 0
+        for indexed in rebuild_index(options['batch_size']):
+            self.stdout.write(f'Проиндексировано постов: {indexed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен, постов: {indexed}'))
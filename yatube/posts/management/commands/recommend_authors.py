@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import page_cache
+from posts.recommendations import load_edges, recommend, save
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «кого почитать» по графу подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int,
+                            default=settings.RECOMMENDATIONS_TOP_K)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        followers, authors = load_edges()
+        loaded = time.perf_counter()
+        result = recommend(followers, authors, options['top_k'],
+                           settings.RECOMMENDATIONS_COFOLLOW_WEIGHT,
+                           settings.RECOMMENDATIONS_MAX_FOLLOWERS)
+        computed = time.perf_counter()
+        save(*result)
+        page_cache.bump('recommendations')
+        self.stdout.write(self.style.SUCCESS(
+            f'Подписок: {len(followers)}, рекомендаций: {len(result[0])}; '
+            f'чтение {loaded - started:.2f} с, расчёт '
+            f'{computed - loaded:.2f} с, запись '
+            f'{time.perf_counter() - computed:.2f} с'))
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts import page_cache
+from posts.models import Comment, Post
+
+
+def count_per_post(queryset):
+    totals = (queryset.filter(post=OuterRef('pk')).order_by()
+              .values('post').annotate(total=Count('*')).values('total'))
+    return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+
+def drifted_scopes(posts):
+    if not posts:
+        return ()
+    scopes = {'index'}
+    for author, group in (Post.objects.filter(id__in=[p.id for p in posts])
+                          .order_by().distinct()
+                          .values_list('author__username', 'group__slug')):
+        scopes.add(f'profile:{author}')
+        if group is not None:
+            scopes.add(f'group:{group}')
+    return scopes
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает comment_count и view_count постов пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        # В приблизительном режиме view_count — оценка скетча, её не трогаем
+        if settings.VIEW_COUNT_MODE == 'approximate':
+            real_views = F('view_count')
+        else:
+            real_views = count_per_post(Post.views.through.objects)
+        last_id = checked = fixed = 0
+        while True:
+            ids = list(Post.objects.filter(id__gt=last_id).order_by('id')
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+            with transaction.atomic():
+                drifted = list(
+                    Post.objects.filter(id__in=ids).only('id').annotate(
+                        real_comments=count_per_post(Comment.objects),
+                        real_views=real_views,
+                    ).exclude(comment_count=F('real_comments'),
+                              view_count=F('real_views')))
+                # Счётчики выводятся в карточке: без version она
+                # осталась бы в кеше со старыми числами
+                for post in drifted:
+                    post.comment_count = post.real_comments
+                    post.view_count = post.real_views
+                    post.version = F('version') + 1
+                Post.objects.bulk_update(
+                    drifted, ['comment_count', 'view_count', 'version'])
+                page_cache.bump(*drifted_scopes(drifted))
+            fixed += len(drifted)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено постов: {checked}, исправлено: {fixed}'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from posts import page_cache
+from posts.models import User, UserStats
+from posts.user_stats import COUNTERS, real_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики профилей пачками и создаёт пропавшие'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = checked = fixed = 0
+        while True:
+            ids = list(User.objects.filter(id__gt=last_id).order_by('id')
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+            with transaction.atomic():
+                existing = set(UserStats.objects.filter(user__in=ids)
+                               .values_list('user', flat=True))
+                UserStats.objects.bulk_create(
+                    UserStats(user_id=user_id) for user_id in ids
+                    if user_id not in existing)
+                annotations = {f'real_{field}': expression
+                               for field, expression in real_counts().items()}
+                in_sync = Q(**{field: F(f'real_{field}')
+                               for field in COUNTERS})
+                drifted = list(UserStats.objects.filter(user__in=ids)
+                               .annotate(**annotations).exclude(in_sync))
+                for stats in drifted:
+                    for field in COUNTERS:
+                        setattr(stats, field,
+                                getattr(stats, f'real_{field}'))
+                UserStats.objects.bulk_update(drifted, list(COUNTERS))
+                # Счётчики выводятся на странице профиля
+                names = User.objects.filter(
+                    id__in=[stats.user_id for stats in drifted]
+                ).values_list('username', flat=True)
+                page_cache.bump(*(f'profile:{name}' for name in names))
+            fixed += len(drifted)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено пользователей: {checked}, исправлено: {fixed}'))
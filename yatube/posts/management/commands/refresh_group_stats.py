@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.group_stats import refresh
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает сводки сообществ; запускать по расписанию, '
+            'чтобы сдвигалось окно активных авторов')
+
+    def handle(self, *args, **options):
+        refreshed = refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено сообществ: {refreshed}'))
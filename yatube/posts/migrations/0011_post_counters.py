@@ -0,0 +1,41 @@
+# Generated by Django 2.2.6 on 2026-10-18 01:25
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+
+    def count_per_post(queryset):
+        totals = (queryset.filter(post=OuterRef('pk')).order_by()
+                  .values('post').annotate(total=Count('*'))
+                  .values('total'))
+        return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+    Post.objects.update(
+        comment_count=count_per_post(Comment.objects),
+        view_count=count_per_post(Post.views.through.objects))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
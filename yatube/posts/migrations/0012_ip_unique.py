@@ -0,0 +1,51 @@
+# Generated by Django 2.2.6 on 2026-10-18 01:27
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def merge_duplicate_ips(apps, schema_editor):
+    # Повторы адреса сводятся к строке с наименьшим id: она получает
+    # просмотры повторов, которых у неё ещё нет, остальные удаляются
+    Ip = apps.get_model('posts', 'Ip')
+    Post = apps.get_model('posts', 'Post')
+    PostViews = Post.views.through
+    duplicates = (Ip.objects.order_by().values('ip')
+                  .annotate(rows=Count('id'), survivor=Min('id'))
+                  .filter(rows__gt=1))
+    merged = False
+    for row in duplicates:
+        extra = Ip.objects.filter(ip=row['ip']).exclude(id=row['survivor'])
+        posts = set(PostViews.objects.filter(ip__in=extra)
+                    .values_list('post_id', flat=True))
+        seen = set(PostViews.objects.filter(ip_id=row['survivor'])
+                   .values_list('post_id', flat=True))
+        PostViews.objects.bulk_create(
+            PostViews(post_id=post_id, ip_id=row['survivor'])
+            for post_id in posts - seen)
+        extra.delete()
+        merged = True
+    if merged:
+        # Один адрес на пост — один просмотр: счётчики пересчитываются
+        totals = (PostViews.objects.filter(post=OuterRef('pk')).order_by()
+                  .values('post').annotate(total=Count('*'))
+                  .values('total'))
+        Post.objects.update(view_count=Coalesce(
+            Subquery(totals, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ips, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ip',
+            name='ip',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.6 on 2026-10-18 01:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_ip_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewSketch',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='view_sketch', serialize=False, to='posts.Post')),
+                ('registers', models.BinaryField()),
+            ],
+            options={
+                'verbose_name': 'Скетч просмотров',
+                'verbose_name_plural': 'Скетчи просмотров',
+            },
+        ),
+    ]
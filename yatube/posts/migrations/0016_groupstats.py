@@ -0,0 +1,62 @@
+# Generated by Django 2.2.6 on 2026-10-18 01:39
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def fill_group_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    Post = apps.get_model('posts', 'Post')
+    GroupStats.objects.bulk_create(
+        GroupStats(group_id=group_id)
+        for group_id in Group.objects.values_list('id', flat=True))
+    posts = Post.objects.filter(group=OuterRef('group')).order_by()
+    since = timezone.now() - timedelta(days=7)
+    GroupStats.objects.update(
+        post_count=Coalesce(Subquery(
+            posts.values('group').annotate(total=Count('*'))
+            .values('total'), output_field=IntegerField()), 0),
+        last_post_date=Subquery(
+            posts.order_by('-pub_date').values('pub_date')[:1]),
+        active_authors=Coalesce(Subquery(
+            posts.filter(pub_date__gte=since).values('group')
+            .annotate(total=Count('author', distinct=True))
+            .values('total'), output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group')),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('last_post_date', models.DateTimeField(blank=True, null=True)),
+                ('active_authors', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Статистика сообщества',
+                'verbose_name_plural': 'Статистика сообществ',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='groupstats',
+            index=models.Index(fields=['-last_post_date', 'group'], name='groupstats_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupstats',
+            index=models.Index(fields=['-post_count', 'group'], name='groupstats_size_idx'),
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
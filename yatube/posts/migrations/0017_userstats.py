@@ -0,0 +1,56 @@
+# Generated by Django 2.2.6 on 2026-10-18 01:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_user_stats(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserStats = apps.get_model('posts', 'UserStats')
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    Comment = apps.get_model('posts', 'Comment')
+
+    def count_per_user(queryset, lookup):
+        totals = (queryset.filter(**{lookup: OuterRef('user')}).order_by()
+                  .values(lookup).annotate(total=Count('*'))
+                  .values('total'))
+        return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+    UserStats.objects.bulk_create(
+        UserStats(user_id=user_id)
+        for user_id in User.objects.values_list('id', flat=True))
+    UserStats.objects.update(
+        post_count=count_per_user(Post.objects, 'author'),
+        follower_count=count_per_user(Follow.objects, 'author'),
+        following_count=count_per_user(Follow.objects, 'user'),
+        comments_received=count_per_user(Comment.objects, 'post__author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0016_groupstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('follower_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+                ('comments_received', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+            },
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
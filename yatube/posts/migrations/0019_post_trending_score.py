@@ -0,0 +1,63 @@
+# Generated by Django 2.2.6 on 2026-10-18 01:46
+
+import math
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+EPOCH = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+def fill_trending_scores(apps, schema_editor):
+    # Время просмотров не хранится: они считаются в момент публикации
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+
+    def event_score(weight, when):
+        age = (when - EPOCH).total_seconds()
+        return math.log(weight) + (
+            math.log(2) * age / settings.TRENDING_HALF_LIFE)
+
+    comments = defaultdict(list)
+    for post_id, created in Comment.objects.values_list('post', 'created'):
+        comments[post_id].append(created)
+    batch = []
+    for post in Post.objects.only('pub_date', 'view_count').iterator():
+        scores = [event_score(settings.TRENDING_POST_WEIGHT, post.pub_date)]
+        if post.view_count:
+            scores.append(event_score(
+                settings.TRENDING_VIEW_WEIGHT * post.view_count,
+                post.pub_date))
+        scores += [event_score(settings.TRENDING_COMMENT_WEIGHT, created)
+                   for created in comments[post.id]]
+        top = max(scores)
+        post.trending_score = top + math.log(
+            math.fsum(math.exp(score - top) for score in scores))
+        batch.append(post)
+        if len(batch) == 500:
+            Post.objects.bulk_update(batch, ['trending_score'])
+            batch = []
+    Post.objects.bulk_update(batch, ['trending_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_recommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trending_score', '-id'], name='post_trending_idx'),
+        ),
+        migrations.RunPython(fill_trending_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 2.2.6 on 2026-10-18 01:52
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+import posts.storage
+
+
+def fill_stored_files(apps, schema_editor):
+    # Старые файлы остаются под прежними именами, но тоже считаются
+    Post = apps.get_model('posts', 'Post')
+    StoredFile = apps.get_model('posts', 'StoredFile')
+    images = (Post.objects.exclude(image='').exclude(image=None)
+              .order_by().values('image')
+              .annotate(refcount=Count('*'), thumbnails=Max('thumbnails')))
+    StoredFile.objects.bulk_create(
+        StoredFile(name=row['image'], refcount=row['refcount'],
+                   thumbnails=row['thumbnails'])
+        for row in images)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/'),
+        ),
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('thumbnails', models.TextField(blank=True, default='')),
+                ('phash_0', models.PositiveIntegerField(blank=True, null=True)),
+                ('phash_1', models.PositiveIntegerField(blank=True, null=True)),
+                ('phash_2', models.PositiveIntegerField(blank=True, null=True)),
+                ('phash_3', models.PositiveIntegerField(blank=True, null=True)),
+                ('similar_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.StoredFile')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+                'verbose_name_plural': 'Файлы картинок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='storedfile',
+            index=models.Index(fields=['phash_0'], name='storedfile_phash_0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='storedfile',
+            index=models.Index(fields=['phash_1'], name='storedfile_phash_1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='storedfile',
+            index=models.Index(fields=['phash_2'], name='storedfile_phash_2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='storedfile',
+            index=models.Index(fields=['phash_3'], name='storedfile_phash_3_idx'),
+        ),
+        migrations.RunPython(fill_stored_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_storedfile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('post_ids', models.TextField(default='[]')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Точка импорта',
+                'verbose_name_plural': 'Точки импорта',
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # Таблица для CACHES['shared'] на DatabaseCache; для других бэкендов
+    # команда ничего не делает
+    call_command('createcachetable', database=schema_editor.connection.alias,
+                 verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_comment_post_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_pull_timeline(apps, schema_editor):
+    # Раньше режим жил только в кеше: переводим всех, кто выше предела
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        follower_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).update(pull_timeline=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_shared_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='pull_timeline',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(fill_pull_timeline, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,17 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import Q, F
+from django.utils.functional import cached_property
+
+from .storage import content_storage
 
 User = get_user_model()
 
 
 class Ip(models.Model):
-    ip = models.CharField(max_length=100)
+    ip = models.CharField(max_length=100, unique=True)
 
     class Meta:
         verbose_name_plural = 'Айпишки'
@@ -30,6 +35,19 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # Всё, что рисует карточка ленты; описание группы и служебные поля
+    # пользователя в ленте не нужны
+    FEED_FIELDS = ('text', 'pub_date', 'image', 'thumbnails',
+                   'comment_count', 'view_count', 'version', 'author',
+                   'author__username', 'group', 'group__title',
+                   'group__slug')
+
+    def feed(self):
+        """Посты для лент: автор и группа одним запросом с JOIN."""
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+
 class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='posts')
@@ -37,19 +55,156 @@ class Post(models.Model):
                               null=True, related_name='posts')
     text = models.TextField()
     pub_date = models.DateTimeField('date published', auto_now_add=True)
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(upload_to='posts/', blank=True, null=True,
+                              storage=content_storage)
     views = models.ManyToManyField(Ip, related_name='post_views', blank=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # ln суммы весов событий, приведённых к TRENDING_EPOCH (posts.trending)
+    trending_score = models.FloatField(default=0, editable=False)
+    # JSON {имя: {url, width, height}} готовых миниатюр (posts.thumbnails)
+    thumbnails = models.TextField(blank=True, default='', editable=False)
+
+    COUNTER_FIELDS = ('comment_count', 'view_count', 'version',
+                      'trending_score', 'thumbnails')
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name_plural = 'Посты'
         verbose_name = 'Пост'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['-trending_score', '-id'],
+                         name='post_trending_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Счётчики, версию и миниатюры меняют только UPDATE: save() по
+        # устаревшему экземпляру не должен их перезаписывать
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS]
+        super().save(*args, **kwargs)
+
     def total_views(self):
-        return self.views.count()
+        return self.view_count
+
+    @cached_property
+    def thumbnail_data(self):
+        return json.loads(self.thumbnails) if self.thumbnails else {}
+
+
+class StoredFile(models.Model):
+    """Файл картинки в хранилище: число ссылающихся постов и варианты.
+
+    Одинаковые загрузки делят один файл и одни варианты (thumbnails);
+    файл удаляется, когда refcount падает до нуля. phash_0..3 — 16-битные
+    полосы перцептивного хеша для поиска похожих картинок по индексу.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    refcount = models.PositiveIntegerField(default=0)
+    thumbnails = models.TextField(blank=True, default='')
+    phash_0 = models.PositiveIntegerField(blank=True, null=True)
+    phash_1 = models.PositiveIntegerField(blank=True, null=True)
+    phash_2 = models.PositiveIntegerField(blank=True, null=True)
+    phash_3 = models.PositiveIntegerField(blank=True, null=True)
+    similar_to = models.ForeignKey('self',
+                                   blank=True,
+                                   null=True,
+                                   related_name='+',
+                                   on_delete=models.SET_NULL)
+
+    PHASH_FIELDS = ('phash_0', 'phash_1', 'phash_2', 'phash_3')
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+        indexes = [
+            models.Index(fields=[field], name=f'storedfile_{field}_idx')
+            for field in ('phash_0', 'phash_1', 'phash_2', 'phash_3')
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @cached_property
+    def thumbnail_data(self):
+        return json.loads(self.thumbnails) if self.thumbnails else {}
+
+
+class ViewSketch(models.Model):
+    """HyperLogLog-скетч уникальных зрителей поста (VIEW_COUNT_MODE)."""
+    post = models.OneToOneField(Post,
+                                primary_key=True,
+                                related_name='view_sketch',
+                                on_delete=models.CASCADE)
+    registers = models.BinaryField()
+
+    class Meta:
+        verbose_name = 'Скетч просмотров'
+        verbose_name_plural = 'Скетчи просмотров'
+
+
+class GroupStats(models.Model):
+    """Сводка по сообществу для каталога; ведётся сигналами Post."""
+    group = models.OneToOneField(Group,
+                                 primary_key=True,
+                                 related_name='stats',
+                                 on_delete=models.CASCADE)
+    post_count = models.PositiveIntegerField(default=0)
+    last_post_date = models.DateTimeField(blank=True, null=True)
+    active_authors = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Статистика сообщества'
+        verbose_name_plural = 'Статистика сообществ'
+        indexes = [
+            models.Index(fields=['-last_post_date', 'group'],
+                         name='groupstats_activity_idx'),
+            models.Index(fields=['-post_count', 'group'],
+                         name='groupstats_size_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики профиля; ведутся сигналами Post, Follow и Comment."""
+    user = models.OneToOneField(User,
+                                primary_key=True,
+                                related_name='stats',
+                                on_delete=models.CASCADE)
+    post_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    comments_received = models.PositiveIntegerField(default=0)
+    # Посты автора читаются в ленты напрямую, а не раскладываются по ним
+    # (см. posts.timeline)
+    pull_timeline = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+
+class CommentQuerySet(models.QuerySet):
+    def thread(self):
+        """Комментарии от новых к старым с автором одним запросом."""
+        return (self.select_related('author')
+                .only('post', 'text', 'created', 'author',
+                      'author__username')
+                .order_by('-created', '-id'))
 
 
 class Comment(models.Model):
@@ -63,6 +218,14 @@ class Comment(models.Model):
     text = models.TextField(blank=True, null=True)
     created = models.DateTimeField(auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User,
@@ -82,3 +245,73 @@ class Follow(models.Model):
                 check=~Q(user=F('author')), name='author'
             )
         ]
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок: строка на (подписчик, пост)."""
+    user = models.ForeignKey(User,
+                             related_name='timeline',
+                             on_delete=models.CASCADE)
+    post = models.ForeignKey(Post,
+                             related_name='timeline_entries',
+                             on_delete=models.CASCADE)
+    author = models.ForeignKey(User,
+                               related_name='+',
+                               on_delete=models.CASCADE)
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+class Recommendation(models.Model):
+    """Кого почитать: top-K авторов на пользователя из recommend_authors."""
+    user = models.ForeignKey(User,
+                             related_name='recommendations',
+                             on_delete=models.CASCADE)
+    author = models.ForeignKey(User,
+                               related_name='+',
+                               on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['user', 'rank']
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'rank'),
+                                    name='unique_recommendation_rank'),
+        ]
+
+
+class ImportCheckpoint(models.Model):
+    """Докуда import_posts дошёл по источнику; с этого места он продолжит.
+
+    post_ids — JSON [[номер поста в источнике, его id], ...]: внутри
+    каждого отрезка id идут подряд, по ним при продолжении
+    восстанавливается карта внешних id постов для комментариев.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    position = models.PositiveIntegerField(default=0)
+    post_ids = models.TextField(default='[]')
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Точка импорта'
+        verbose_name_plural = 'Точки импорта'
+
+    def __str__(self):
+        return f'{self.source}: {self.position}'
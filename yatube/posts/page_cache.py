@@ -0,0 +1,137 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .models import Group
+
+
+def shared_cache():
+    """Кеш поколений: общий для всех процессов, иначе bump() в одном
+    воркере не увидят остальные (см. CACHES['shared'])."""
+    return caches['shared']
+
+
+def generation_key(scope):
+    return f'generation:{scope}'
+
+
+def initial_generation():
+    # Если ключ поколения вытеснен из кеша, новое значение всё равно
+    # больше старого, и устаревшие страницы не воскреснут
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes):
+    """Поколения областей одним get_many; вытесненное начинается заново."""
+    keys = [generation_key(scope) for scope in scopes]
+    shared = shared_cache()
+    found = shared.get_many(keys)
+    for key in keys:
+        if key not in found:
+            shared.add(key, initial_generation(), None)
+            found[key] = shared.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    shared = shared_cache()
+    for scope in scopes:
+        key = generation_key(scope)
+        if shared.add(key, initial_generation(), None):
+            continue
+        try:
+            shared.incr(key)
+        except ValueError:
+            shared.set(key, initial_generation(), None)
+
+
+def model_scope(model):
+    """Область всех строк модели: по ней кешируются COUNT(*) пагинатора."""
+    return f'model:{model._meta.label}'
+
+
+def post_scopes(post):
+    group_ids = {post.group_id, getattr(post, '_previous_group_id', None)}
+    group_ids.discard(None)
+    slugs = (Group.objects.filter(id__in=group_ids)
+             .values_list('slug', flat=True) if group_ids else ())
+    return ['index', f'profile:{post.author.username}',
+            *(f'group:{slug}' for slug in slugs)]
+
+
+def page_variant(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return 'anonymous'
+
+
+def page_key(request, generations):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    generations = '.'.join(map(str, generations))
+    return f'page:{path}:{page_variant(request)}:{generations}'
+
+
+def page_etag(request, key, timeout):
+    """ETag страницы с ключом key: меняется с поколениями, CSRF-кукой
+    (форма страницы несёт её токен) и раз в timeout секунд — столько
+    живут и закешированные страницы с неучтёнными счётчиками."""
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    epoch = int(time.time() // timeout)
+    raw = f'{key}:{csrf}:{epoch}'
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def conditional_generations(scopes, timeout=None, cache_pages=False):
+    """ETag страницы по поколениям её областей.
+
+    Повторная проверка (If-None-Match) получает 304 после одного чтения
+    общего кеша и без других запросов; пока CACHES['shared'] — таблица
+    базы, это чтение — один SQL-запрос. Страница зависит от пользователя,
+    CSRF-куки и времени (page_etag), а дата изменения — только от
+    областей, поэтому Last-Modified не отдаётся: иначе If-Modified-Since
+    вернул бы 304 и после входа на сайт. Прокси страницу не хранят
+    (private, no-cache).
+    cache_pages — хранить и сами страницы, см. cache_page_generations.
+    """
+    timeout = timeout or settings.PAGE_CACHE_TIMEOUT
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            generations = get_generations(scopes(request, *args, **kwargs))
+            key = page_key(request, generations)
+            etag = page_etag(request, key, timeout)
+            response = get_conditional_response(request, etag=etag)
+            if response is None and cache_pages:
+                response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if (cache_pages and response.status_code == 200
+                        and not response.cookies):
+                    cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_page_generations(scopes):
+    """Кеширует страницу, пока не сменится поколение одной из её областей.
+
+    scopes(request, *args, **kwargs) возвращает области страницы, например
+    ['index', 'groups']; сигналы моделей увеличивают поколения областей,
+    поэтому новое содержимое видно сразу, а без изменений страница живёт
+    PAGE_CACHE_TIMEOUT секунд. Анонимы делят одну копию, у каждого
+    вошедшего пользователя — своя. Браузеру страница отдаётся с ETag
+    (conditional_generations).
+    """
+    return conditional_generations(scopes, cache_pages=True)
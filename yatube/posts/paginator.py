@@ -0,0 +1,181 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .page_cache import get_generations, model_scope
+
+NEXT = 'n'
+PREVIOUS = 'p'
+ELLIPSIS = '…'
+
+
+def encode_cursor(direction, position):
+    raw = '|'.join((direction, *map(str, position)))
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(cursor):
+    """(направление, поля позиции строками); битый курсор — первая страница."""
+    if not cursor:
+        return NEXT, None
+    try:
+        direction, *position = (
+            urlsafe_base64_decode(cursor).decode().split('|'))
+    except (ValueError, UnicodeDecodeError):
+        return NEXT, None
+    if direction not in (NEXT, PREVIOUS):
+        return NEXT, None
+    return direction, position
+
+
+def keyset_slice(queryset, keys, direction, position, limit):
+    """Строки строго после (или до) position в порядке убывания keys."""
+    first, second = keys
+    if direction == PREVIOUS:
+        lookup, ordering = 'gt', (first, second)
+    else:
+        lookup, ordering = 'lt', (f'-{first}', f'-{second}')
+    if position is not None:
+        value, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{first}__{lookup}': value})
+            | Q(**{first: value, f'{second}__{lookup}': pk}),
+            **{f'{first}__{lookup}e': value})
+    return list(queryset.order_by(*ordering)[:limit])
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id) без COUNT(*) и OFFSET.
+
+    Любая страница — один запрос по индексу, поэтому глубокие страницы
+    стоят столько же, сколько первая. Номеров страниц нет: страница знает
+    только непрозрачные курсоры next_cursor/previous_cursor.
+    """
+    keys = ('pub_date', 'id')
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._number = 1
+        self._has_next = False
+
+    @property
+    def num_pages(self):
+        return self._number + self._has_next
+
+    def get_position(self, obj):
+        return obj.pub_date.isoformat(), obj.id
+
+    def parse_position(self, raw):
+        date, pk = raw
+        date = parse_datetime(date)
+        if date is None:
+            raise ValueError('Некорректная дата в курсоре')
+        return date, int(pk)
+
+    def fetch(self, direction, position, limit):
+        return keyset_slice(self.object_list, self.keys,
+                            direction, position, limit)
+
+    def parse_cursor(self, cursor):
+        direction, position = decode_cursor(cursor)
+        if position is not None:
+            try:
+                position = self.parse_position(position)
+            except (ValueError, TypeError):
+                direction, position = NEXT, None
+        return direction, position
+
+    def peek(self, cursor, *fields):
+        """Только fields строк страницы (и одной за ней): лёгкий запрос
+        без JOIN для ETag до настоящей выборки."""
+        direction, position = self.parse_cursor(cursor)
+        return keyset_slice(self.object_list.values_list(*fields), self.keys,
+                            direction, position, self.per_page + 1)
+
+    def get_page(self, cursor):
+        direction, position = self.parse_cursor(cursor)
+        rows = self.fetch(direction, position, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = position is not None, has_more
+        self._number = 2 if has_previous else 1
+        self._has_next = has_next and bool(rows)
+        page = self._get_page(rows, self._number, self)
+        page.previous_cursor = (
+            encode_cursor(PREVIOUS, self.get_position(rows[0]))
+            if has_previous and rows else None)
+        page.next_cursor = (
+            encode_cursor(NEXT, self.get_position(rows[-1]))
+            if self._has_next else None)
+        return page
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии поста от новых к старым по индексу (post, created, id)."""
+    keys = ('created', 'id')
+
+    def get_position(self, obj):
+        return obj.created.isoformat(), obj.id
+
+
+class CachedCountPaginator(Paginator):
+    """Номерная пагинация с кешированным COUNT(*) и окном номеров страниц.
+
+    Число строк кешируется по SQL запроса и поколению модели, которое
+    растёт при каждом save()/delete() (приёмники posts.signals у моделей
+    User, Group, GroupStats и Post). В шаблон уходит не весь
+    page_range, а page.page_window: первая и последняя страницы,
+    ON_EACH_SIDE соседей текущей и многоточия между ними.
+    """
+    ON_EACH_SIDE = 2
+    ON_ENDS = 1
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        try:
+            sql = str(queryset.query)
+        except (AttributeError, EmptyResultSet):
+            return super().count
+        generation, = get_generations([model_scope(queryset.model)])
+        signature = hashlib.md5(sql.encode()).hexdigest()
+        key = f'paginator_count:{generation}:{signature}'
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+        return count
+
+    def get_page_window(self, number):
+        last = self.num_pages
+        if last <= 2 * (self.ON_EACH_SIDE + self.ON_ENDS) + 1:
+            return list(range(1, last + 1))
+        window = []
+        low = max(number - self.ON_EACH_SIDE, 1)
+        high = min(number + self.ON_EACH_SIDE, last)
+        if low > self.ON_ENDS + 1:
+            window += [*range(1, self.ON_ENDS + 1), ELLIPSIS]
+        else:
+            low = 1
+        window += range(low, high + 1)
+        if high < last - self.ON_ENDS:
+            window += [ELLIPSIS, *range(last - self.ON_ENDS + 1, last + 1)]
+        else:
+            window += range(high + 1, last + 1)
+        return window
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        page.page_window = self.get_page_window(page.number)
+        return page
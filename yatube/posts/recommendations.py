@@ -0,0 +1,88 @@
+"""Рекомендации «кого почитать» по графу подписок.
+
+Считаются офлайн командой recommend_authors: NumPy и SciPy нужны только
+ей, веб-процессы читают готовую таблицу Recommendation.
+"""
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from .models import Follow, Recommendation
+
+BATCH_SIZE = 5000
+
+
+def load_edges():
+    """Рёбра графа: массивы (подписчик, автор)."""
+    edges = np.array(list(Follow.objects.values_list('user_id', 'author_id')),
+                     dtype=np.int64).reshape(-1, 2)
+    return edges[:, 0], edges[:, 1]
+
+
+def build_graph(followers, authors):
+    """Разреженная матрица подписок graph[u, a] = 1 в плотных индексах."""
+    ids, dense = np.unique(np.concatenate([followers, authors]),
+                           return_inverse=True)
+    rows, cols = dense[:len(followers)], dense[len(followers):]
+    graph = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(ids), len(ids)))
+    return ids, graph
+
+
+def score(graph, cofollow_weight, max_followers):
+    # Друзья друзей: u читает f, f читает x
+    scores = graph @ graph
+    # Совместные подписки: читатели с общими авторами читают x. Авторы
+    # с более чем max_followers подписчиками не делают читателей похожими
+    # и раздули бы матрицу пересечений квадратично
+    followers = np.asarray(graph.sum(axis=0)).ravel()
+    niche = sparse.diags((followers <= max_followers).astype(np.float32))
+    overlap = graph @ niche @ graph.T
+    scores = scores + cofollow_weight * (overlap @ graph)
+    # Уже прочитанных авторов не советуем
+    return (scores - scores.multiply(graph)).tocsr()
+
+
+def top_k(scores, k):
+    """Лучшие k положительных оценок каждой строки, кроме диагонали."""
+    scores.sum_duplicates()
+    rows = np.repeat(np.arange(scores.shape[0]), np.diff(scores.indptr))
+    keep = (rows != scores.indices) & (scores.data > 0)
+    rows, cols = rows[keep], scores.indices[keep]
+    data = scores.data[keep].astype(np.float64)
+    if not len(data):
+        return rows, cols, data, rows
+    # Одна устойчивая сортировка по ключу (строка, -оценка) вместо
+    # lexsort по трём массивам; столбцы внутри строки CSR уже по
+    # возрастанию и при равных оценках сохраняют порядок
+    order = np.argsort(rows * (data.max() + 1) - data, kind='stable')
+    rows, cols, data = rows[order], cols[order], data[order]
+    ranks = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = ranks < k
+    return rows[keep], cols[keep], data[keep], ranks[keep]
+
+
+def recommend(followers, authors, k, cofollow_weight, max_followers):
+    """Массивы (user_id, author_id, score, rank) рекомендаций."""
+    if not len(followers):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty.astype(np.float32), empty
+    ids, graph = build_graph(followers, authors)
+    rows, cols, data, ranks = top_k(
+        score(graph, cofollow_weight, max_followers), k)
+    return ids[rows], ids[cols], data, ranks
+
+
+def save(users, authors, scores, ranks):
+    with transaction.atomic():
+        # Быстрое удаление одним DELETE: у Recommendation нет сигналов
+        Recommendation.objects.all().delete()
+        for start in range(0, len(users), BATCH_SIZE):
+            chunk = slice(start, start + BATCH_SIZE)
+            Recommendation.objects.bulk_create(
+                Recommendation(user_id=user, author_id=author, score=value,
+                               rank=rank)
+                for user, author, value, rank in zip(
+                    users[chunk].tolist(), authors[chunk].tolist(),
+                    scores[chunk].tolist(), ranks[chunk].tolist()))
@@ -0,0 +1,119 @@
+import re
+
+from django.db import connection, transaction
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginator import NEXT, CursorPaginator
+
+TABLE = 'posts_post_fts'
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 24
+
+
+def fts_query(text):
+    """Слова запроса в кавычках: спецсимволы FTS5 не ломают поиск."""
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', text))
+
+
+def index_post(post_id, text):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+        cursor.execute(f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+                       [post_id, text])
+
+
+def index_posts(rows):
+    """Индексирует пачку новых постов (id, текст) одним executemany."""
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)', rows)
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index(batch_size=1000):
+    """Перестраивает индекс с нуля пачками по id; отдаёт число постов."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    last_id = indexed = 0
+    while True:
+        rows = list(Post.objects.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', 'text')[:batch_size])
+        if not rows:
+            break
+        with transaction.atomic():
+            index_posts(rows)
+        last_id = rows[-1][0]
+        indexed += len(rows)
+        yield indexed
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def filter_matching(queryset, text):
+    """Оставляет в queryset постов только совпавшие с запросом."""
+    query = fts_query(text)
+    if not query:
+        # Только знаки препинания: MATCH '' — синтаксическая ошибка FTS5
+        return queryset.none()
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        where=[f'{table}.id IN (SELECT rowid FROM {TABLE} '
+               f'WHERE {TABLE} MATCH %s)'],
+        params=[query])
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(MARK_START, '<mark>')
+                     .replace(MARK_END, '</mark>'))
+
+
+def search(text, direction, position, limit):
+    """(id, bm25, сниппет) по возрастанию bm25: лучшие совпадения первыми."""
+    sign, order = ('>', 'ASC') if direction == NEXT else ('<', 'DESC')
+    sql = (f"SELECT rowid, rank, snippet({TABLE}, 0, %s, %s, '…', %s) "
+           f'FROM {TABLE} WHERE {TABLE} MATCH %s')
+    params = [MARK_START, MARK_END, SNIPPET_TOKENS, fts_query(text)]
+    if position is not None:
+        rank, pk = position
+        sql += f' AND (rank {sign} %s OR (rank = %s AND rowid {sign} %s))'
+        params += [rank, rank, pk]
+    sql += f' ORDER BY rank {order}, rowid {order} LIMIT %s'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return cursor.fetchall()
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорные страницы результатов поиска, упорядоченных по bm25."""
+
+    def __init__(self, text, per_page, **kwargs):
+        super().__init__(Post.objects.feed(), per_page, **kwargs)
+        self.text = text
+
+    def get_position(self, obj):
+        return repr(obj.rank), obj.id
+
+    def parse_position(self, raw):
+        rank, pk = raw
+        return float(rank), int(pk)
+
+    def fetch(self, direction, position, limit):
+        if not fts_query(self.text):
+            return []
+        hits = search(self.text, direction, position, limit)
+        posts = self.object_list.in_bulk([post_id for post_id, *_ in hits])
+        rows = []
+        for post_id, rank, snippet in hits:
+            post = posts.get(post_id)
+            if post is not None:
+                post.rank = rank
+                post.snippet = highlight(snippet)
+                rows.append(post)
+        return rows
@@ -0,0 +1,387 @@
+import threading
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import (autocomplete, follow_graph, group_stats, page_cache, search,
+               stored_files, thumbnails, timeline, trending, user_stats)
+from .models import Comment, Follow, Group, GroupStats, Post, User, UserStats
+from .view_buffer import view_buffer
+
+
+class Deleting(threading.local):
+    """Посты и пользователи, которые сейчас удаляются в этом потоке.
+
+    Их комментарии и подписки удаляются каскадом раньше них самих; итоги
+    такого каскада подводятся одним разом в pre_delete родителя, а
+    построчные приёмники пропускают строки. Если удаление откатилось,
+    post_delete не придёт: множества очищаются в конце каждого запроса
+    (forget_deleting), чтобы следующий запрос этого потока не пропустил
+    строки живого родителя.
+    """
+
+    def __init__(self):
+        self.posts = set()
+        self.users = set()
+
+    def clear(self):
+        self.posts.clear()
+        self.users.clear()
+
+    def has_comment(self, comment):
+        return (comment.post_id in self.posts
+                or comment.author_id in self.users)
+
+    def has_follow(self, follow):
+        return follow.user_id in self.users or follow.author_id in self.users
+
+
+deleting = Deleting()
+
+
+# Post
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image').first() or (None, None))
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def bump_post_version(sender, instance, created, **kwargs):
+    if not created:
+        Post.objects.filter(id=instance.id).update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=Post)
+def start_trending_score(sender, instance, created, **kwargs):
+    if created:
+        trending.start(instance)
+
+
+# Раньше schedule_thumbnails: варианты пишутся в строку StoredFile
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_image', None) or ''
+    current = instance.image.name or ''
+    if current != previous:
+        if current:
+            stored_files.acquire(current)
+        if previous:
+            stored_files.release(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    if instance.image:
+        stored_files.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnails(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_image', None) or ''
+    if (instance.image.name or '') != previous:
+        thumbnails.schedule(instance.id)
+
+
+# Страницы поста и COUNT(*) постов: поколение модели здесь же
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    page_cache.bump(*page_cache.post_scopes(instance),
+                    page_cache.model_scope(Post))
+
+
+@receiver(post_save, sender=Post)
+def count_group_post(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_group_id', None)
+    if not created and previous == instance.group_id:
+        return
+    if previous is not None:
+        group_stats.post_removed(previous)
+    if instance.group_id is not None:
+        group_stats.post_added(instance)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_group_post(sender, instance, **kwargs):
+    if instance.group_id is not None:
+        group_stats.post_removed(instance.group_id)
+
+
+# post_delete не передаёт created: удаление считается всегда
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def count_user_post(sender, instance, signal, created=True, **kwargs):
+    if created:
+        delta = 1 if signal is post_save else -1
+        user_stats.change([instance.author_id], delta, 'post_count')
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, **kwargs):
+    search.index_post(instance.id, instance.text)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post_text(sender, instance, **kwargs):
+    search.unindex_post(instance.id)
+
+
+# Комментарии поста уходят каскадом: их счётчик у автора — одним UPDATE
+@receiver(pre_delete, sender=Post)
+def settle_post_comments(sender, instance, **kwargs):
+    deleting.posts.add(instance.pk)
+    # Не instance.comment_count: экземпляр мог устареть
+    user_stats.discount(Comment.objects.filter(post=instance),
+                        'post__author', 'comments_received')
+
+
+@receiver(post_delete, sender=Post)
+def forget_deleted_post(sender, instance, **kwargs):
+    deleting.posts.discard(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.views.through)
+def update_view_count(sender, instance, action, reverse, pk_set, **kwargs):
+    # Обратная очистка (ip.post_views.clear()) не отслеживается —
+    # такой дрейф исправляет reconcile_counters
+    if action == 'post_clear' and not reverse:
+        Post.objects.filter(id=instance.id).update(view_count=0)
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    if reverse:
+        posts, delta = Post.objects.filter(id__in=pk_set), 1
+    else:
+        posts, delta = Post.objects.filter(id=instance.id), len(pk_set)
+    if action == 'post_add':
+        posts.update(view_count=F('view_count') + delta)
+    else:
+        posts.filter(view_count__gte=delta).update(
+            view_count=F('view_count') - delta)
+
+
+@receiver(request_finished)
+def forget_deleting(sender, **kwargs):
+    deleting.clear()
+
+
+@receiver(request_finished)
+def flush_view_buffer(sender, **kwargs):
+    if view_buffer.is_due():
+        view_buffer.flush()
+
+
+# Group
+
+@receiver(post_save, sender=Group)
+def bump_group_posts_version(sender, instance, created, **kwargs):
+    if not created:
+        instance.posts.update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    page_cache.bump('groups', f'group:{instance.slug}',
+                    page_cache.model_scope(Group))
+
+
+# Подключён после invalidate_group_pages: индекс сверяет поколение модели
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def sync_group_index(sender, instance, signal, **kwargs):
+    autocomplete.groups.sync(instance, deleted=signal is post_delete)
+
+
+@receiver(post_save, sender=Group)
+def create_group_stats(sender, instance, created, **kwargs):
+    if created:
+        GroupStats.objects.create(group=instance)
+
+
+@receiver(post_save, sender=GroupStats)
+@receiver(post_delete, sender=GroupStats)
+def invalidate_group_stats_counts(sender, **kwargs):
+    page_cache.bump(page_cache.model_scope(GroupStats))
+
+
+# Follow: при удалении пользователя итоги подводит settle_user_follows
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    if not deleting.has_follow(instance):
+        timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_graph(sender, instance, **kwargs):
+    if not deleting.has_follow(instance):
+        follow_graph.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    if not deleting.has_follow(instance):
+        page_cache.bump(f'profile:{instance.author.username}',
+                        f'profile:{instance.user.username}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def count_user_follow(sender, instance, signal, created=True, **kwargs):
+    if created and not deleting.has_follow(instance):
+        delta = 1 if signal is post_save else -1
+        user_stats.change([instance.user_id], delta, 'following_count')
+        user_stats.change([instance.author_id], delta, 'follower_count')
+
+
+# Подключён после count_user_follow: режим сверяется с follower_count
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def update_timeline_mode(sender, instance, **kwargs):
+    if not deleting.has_follow(instance):
+        timeline.update_mode(instance.author_id)
+
+
+# Comment: при удалении поста или пользователя итоги подводят
+# settle_post_comments и settle_user_comments
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(id=instance.post_id).update(
+            comment_count=F('comment_count') + 1,
+            version=F('version') + 1)
+
+
+@receiver(post_save, sender=Comment)
+def record_trending_comment(sender, instance, created, **kwargs):
+    if created:
+        trending.record(instance.post_id, settings.TRENDING_COMMENT_WEIGHT,
+                        instance.created)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    if not deleting.has_comment(instance):
+        Post.objects.filter(id=instance.post_id).update(
+            comment_count=Greatest(F('comment_count') - 1, 0),
+            version=F('version') + 1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    if not deleting.has_comment(instance):
+        page_cache.bump(*page_cache.post_scopes(instance.post))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def count_user_comment(sender, instance, signal, created=True, **kwargs):
+    if created and not deleting.has_comment(instance):
+        delta = 1 if signal is post_save else -1
+        author = Post.objects.filter(id=instance.post_id).values('author')
+        user_stats.change(author, delta, 'comments_received')
+
+
+# User
+
+def is_login(update_fields):
+    """Сохранение только last_login при входе: ни число пользователей, ни
+    индекс автодополнения от него не меняются."""
+    return update_fields is not None and set(update_fields) == {'last_login'}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_counts(sender, update_fields=None, **kwargs):
+    if not is_login(update_fields):
+        page_cache.bump(page_cache.model_scope(User))
+
+
+# Подключён после invalidate_user_counts: индекс сверяет поколение модели
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def sync_user_index(sender, instance, signal, update_fields=None, **kwargs):
+    if not is_login(update_fields):
+        autocomplete.users.sync(instance, deleted=signal is post_delete)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.create(user=instance)
+
+
+# Подписки пользователя уходят каскадом: счётчики, графы подписок и
+# профили второй стороны — по одному запросу на всех
+@receiver(pre_delete, sender=User)
+def settle_user_follows(sender, instance, **kwargs):
+    deleting.users.add(instance.pk)
+    followers = Follow.objects.filter(author=instance)
+    following = Follow.objects.filter(user=instance)
+    user_stats.discount(followers, 'user', 'following_count')
+    user_stats.discount(following, 'author', 'follower_count')
+    follower_ids = list(followers.values_list('user', flat=True))
+    follow_graph.invalidate(instance.pk, *follower_ids)
+    names = {*followers.values_list('user__username', flat=True),
+             *following.values_list('author__username', flat=True)}
+    page_cache.bump(*(f'profile:{name}' for name in names))
+    # Строки лент пишутся после каскада, см. update_pull_authors
+    instance._pull_authors = list(
+        UserStats.objects.filter(pull_timeline=True,
+                                 user__in=following.values('author'))
+        .values_list('user', flat=True))
+
+
+# Комментарии пользователя к чужим постам: счётчики постов и их авторов,
+# страницы постов. К своим постам — уходят вместе с постами
+@receiver(pre_delete, sender=User)
+def settle_user_comments(sender, instance, **kwargs):
+    comments = (Comment.objects.filter(author=instance)
+                .exclude(post__author=instance))
+    totals = (comments.filter(post=OuterRef('pk')).order_by()
+              .values('post').annotate(total=Count('*')).values('total'))
+    Post.objects.filter(id__in=comments.values('post')).update(
+        comment_count=Greatest(F('comment_count') - Subquery(
+            totals, output_field=IntegerField()), 0),
+        version=F('version') + 1)
+    user_stats.discount(comments, 'post__author', 'comments_received')
+    scopes = set()
+    for author, group in (comments.order_by().distinct().values_list(
+            'post__author__username', 'post__group__slug')):
+        scopes.add(f'profile:{author}')
+        if group is not None:
+            scopes.add(f'group:{group}')
+    if scopes:
+        page_cache.bump('index', *scopes)
+
+
+@receiver(post_delete, sender=User)
+def update_pull_authors(sender, instance, **kwargs):
+    deleting.users.discard(instance.pk)
+    for author_id in getattr(instance, '_pull_authors', ()):
+        timeline.update_mode(author_id)
@@ -0,0 +1,60 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from .hyperloglog import HyperLogLog
+from .models import Post, ViewSketch
+
+
+def write_sketches(events):
+    """Добавляет пары (post_id, ip) в скетчи и пишет оценку в view_count.
+
+    Возвращает id существующих постов из пачки.
+    """
+    by_post = defaultdict(set)
+    for post_id, ip in events:
+        by_post[post_id].add(ip)
+    with transaction.atomic():
+        post_ids = set(Post.objects.filter(id__in=by_post).order_by()
+                       .values_list('id', flat=True))
+        stored = {sketch.post_id: sketch for sketch in
+                  ViewSketch.objects.filter(post_id__in=post_ids)}
+        # Новый скетч начинается с уже записанных точных просмотров,
+        # чтобы переключение режима не обнуляло счётчик
+        seeds = Post.views.through.objects.filter(
+            post_id__in=post_ids - stored.keys()
+        ).values_list('post_id', 'ip__ip')
+        for post_id, ip in seeds:
+            by_post[post_id].add(ip)
+        created, estimates = [], {}
+        for post_id in post_ids:
+            sketch = stored.get(post_id)
+            if sketch is None:
+                hll = HyperLogLog(settings.VIEW_SKETCH_PRECISION)
+                sketch = ViewSketch(post_id=post_id)
+                created.append(sketch)
+            else:
+                hll = HyperLogLog.from_bytes(sketch.registers)
+            hll.update(by_post[post_id])
+            sketch.registers = hll.to_bytes()
+            estimates[post_id] = hll.count()
+        ViewSketch.objects.bulk_create(created)
+        ViewSketch.objects.bulk_update(stored.values(), ['registers'])
+        if estimates:
+            Post.objects.filter(id__in=estimates).update(view_count=Case(
+                *(When(id=post_id, then=Value(estimate))
+                  for post_id, estimate in estimates.items()),
+                output_field=IntegerField()))
+    return post_ids
+
+
+def unique_viewers(posts):
+    """Оценка уникальных зрителей набора постов: автора, группы и т.п."""
+    total = HyperLogLog(settings.VIEW_SKETCH_PRECISION)
+    registers = ViewSketch.objects.filter(post__in=posts).values_list(
+        'registers', flat=True)
+    for data in registers.iterator():
+        total.merge(HyperLogLog.from_bytes(data))
+    return total.count()
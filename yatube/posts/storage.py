@@ -0,0 +1,64 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from .images import strip_metadata
+
+HASHED_NAME = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}(\.\w+)?$')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файл под sha256 содержимого: <upload_to>/ab/<sha256>.<ext>.
+
+    Хеш считается по ходу записи во временный файл рядом с целью, поэтому
+    загрузка читается один раз. Повторная загрузка тех же байтов не
+    создаёт копию и получает то же имя; сколько постов ссылается на файл,
+    считает posts.stored_files. Метаданные JPEG (геометка, модель камеры)
+    вырезаются по ходу записи, до хеша.
+    """
+
+    @staticmethod
+    def is_hashed(name):
+        """Имя дало это хранилище, а не старая загрузка до него."""
+        return bool(HASHED_NAME.search(name))
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым: суффиксы против коллизий не нужны
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        digest = hashlib.sha256()
+        handle, temp_path = tempfile.mkstemp(dir=self.path(directory),
+                                             suffix='.upload')
+        try:
+            with os.fdopen(handle, 'wb') as temp:
+                for chunk in strip_metadata(content.chunks()):
+                    digest.update(chunk)
+                    temp.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = os.path.join(directory, hexdigest[:2],
+                                hexdigest + extension)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name.replace('\\', '/')
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,82 @@
+import json
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from .models import StoredFile
+from .storage import content_storage
+
+BAND_BITS = 16
+
+
+def hash_bands(phash):
+    """Четыре 16-битные полосы 64-битного хеша, старшая первой."""
+    return [(phash >> (BAND_BITS * index)) & 0xFFFF
+            for index in reversed(range(len(StoredFile.PHASH_FIELDS)))]
+
+
+def join_bands(bands):
+    phash = 0
+    for band in bands:
+        phash = phash << BAND_BITS | band
+    return phash
+
+
+def acquire(name):
+    StoredFile.objects.get_or_create(name=name)
+    StoredFile.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name):
+    StoredFile.objects.filter(name=name).update(
+        refcount=Greatest(F('refcount') - 1, 0))
+    stored = StoredFile.objects.filter(name=name, refcount=0).first()
+    if stored is not None:
+        variants = stored.thumbnail_data.get('files', [])
+        stored.delete()
+        transaction.on_commit(partial(delete_files, name, variants))
+
+
+def delete_files(name, variants):
+    # Те же байты могли загрузить заново, пока шла транзакция удаления
+    if StoredFile.objects.filter(name=name).exists():
+        return
+    # Файлы, загруженные до content_storage, не трогаем: их имена могли
+    # указывать куда угодно
+    if content_storage.is_hashed(name):
+        content_storage.delete(name)
+    for variant in variants:
+        default_storage.delete(variant)
+
+
+def find_similar(name, phash):
+    """Ближайший по Хэммингу файл не дальше IMAGE_PHASH_DISTANCE бит.
+
+    При расстоянии меньше четырёх хотя бы одна из четырёх полос совпадает
+    точно, поэтому кандидатов дают индексы полос, а не перебор таблицы.
+    """
+    bands = hash_bands(phash)
+    matches_band = Q()
+    for field, band in zip(StoredFile.PHASH_FIELDS, bands):
+        matches_band |= Q(**{field: band})
+    candidates = (StoredFile.objects.filter(matches_band).exclude(name=name)
+                  .values_list('name', *StoredFile.PHASH_FIELDS))
+    best, best_distance = None, settings.IMAGE_PHASH_DISTANCE + 1
+    for other, *other_bands in candidates:
+        distance = bin(phash ^ join_bands(other_bands)).count('1')
+        if distance < best_distance:
+            best, best_distance = other, distance
+    return best
+
+
+def remember_variants(name, thumbnails, phash=None):
+    """Сохраняет общие для дубликатов варианты и перцептивный хеш."""
+    values = {'thumbnails': json.dumps(thumbnails)}
+    if phash is not None:
+        values.update(zip(StoredFile.PHASH_FIELDS, hash_bands(phash)))
+        values['similar_to_id'] = find_similar(name, phash)
+    StoredFile.objects.filter(name=name).update(**values)
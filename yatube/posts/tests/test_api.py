@@ -0,0 +1,91 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..models import Comment, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        cls.group = Group.objects.create(title='Кошки', slug='cats',
+                                         description='Про кошек')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds(self):
+        for url, header in (
+                (reverse('api:index'), None),
+                (reverse('api:group', args=('cats',)), 'group'),
+                (reverse('api:profile', args=('testuser',)), 'author')):
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual([post['id'] for post in data['results']],
+                                 [self.post.id])
+                self.assertEqual(data['results'][0]['group']['slug'], 'cats')
+                if header:
+                    self.assertIn(header, data)
+        response = self.client.get(reverse('api:group', args=('dogs',)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_revalidation_is_answered_before_serialization(self):
+        url = reverse('api:index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since_does_not_hide_edits(self):
+        url = reverse('api:post', args=(self.post.id,))
+        self.assertNotIn('Last-Modified', self.client.get(url))
+        self.post.text = 'Новый текст'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['text'], 'Новый текст')
+
+    def test_etag_changes_with_content(self):
+        urls = (reverse('api:index'),
+                reverse('api:post', args=(self.post.id,)),
+                reverse('api:comments', args=(self.post.id,)))
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        response = self.client.get(urls[1], HTTP_IF_NONE_MATCH=etags[1])
+        self.assertEqual(response.json()['text'], 'Новый текст')
+
+    @override_settings(COMMENTS_PAGE_SIZE=2)
+    def test_comments_are_cursor_paginated(self):
+        comments = [Comment.objects.create(post=self.post, author=self.user,
+                                           text=f'Комментарий {i}')
+                    for i in range(3)]
+        url = reverse('api:comments', args=(self.post.id,))
+        first = self.client.get(url).json()
+        self.assertEqual([comment['id'] for comment in first['results']],
+                         [comments[2].id, comments[1].id])
+        second = self.client.get(url, {'cursor': first['next_cursor']}).json()
+        self.assertEqual([comment['id'] for comment in second['results']],
+                         [comments[0].id])
+        self.assertIsNone(second['next_cursor'])
+        response = self.client.get(reverse('api:comments', args=(0,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_read_only(self):
+        response = self.client.post(reverse('api:index'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import autocomplete
+from ..models import Group, User
+
+
+class AutocompleteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for username in ('anna', 'Andrey', 'boris', 'anton'):
+            User.objects.create_user(username=username)
+        Group.objects.create(title='Аниме', slug='anime')
+        Group.objects.create(title='Books', slug='books')
+        autocomplete.warm()
+
+    def suggest(self, query):
+        response = self.client.get(reverse('autocomplete'), {'q': query})
+        return response.json()
+
+    def test_prefix_is_case_insensitive_and_sorted(self):
+        self.assertEqual(self.suggest('AN'), {
+            'users': [{'username': 'Andrey'}, {'username': 'anna'},
+                      {'username': 'anton'}],
+            'groups': [],
+        })
+        self.assertEqual(self.suggest('ани')['groups'],
+                         [{'title': 'Аниме', 'slug': 'anime'}])
+
+    def test_search_does_not_hit_database(self):
+        with self.assertNumQueries(0):
+            self.suggest('b')
+
+    def test_index_follows_saves_and_deletes(self):
+        User.objects.create_user(username='anfisa')
+        group = Group.objects.get(slug='books')
+        group.title = 'Аналитика'
+        group.save()
+        User.objects.get(username='anna').delete()
+        with self.assertNumQueries(0):
+            users = self.suggest('an')['users']
+            groups = self.suggest('ан')['groups']
+        self.assertEqual([user['username'] for user in users],
+                         ['Andrey', 'anfisa', 'anton'])
+        self.assertEqual([group['slug'] for group in groups],
+                         ['books', 'anime'])
+
+    def test_stale_index_reloads_after_check_interval(self):
+        autocomplete.users.generation -= 1
+        with self.assertNumQueries(0):
+            self.suggest('an')
+        autocomplete.users.checked -= settings.AUTOCOMPLETE_CHECK_INTERVAL
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(len(self.suggest('an')['users']), 3)
+        self.assertIn('auth_user', context[-1]['sql'])
+
+    def test_login_does_not_invalidate_index(self):
+        user = User.objects.get(username='anna')
+        generation = autocomplete.users.generation
+        update_last_login(None, user)
+        self.assertEqual(autocomplete.users.current_generation(), generation)
+
+    def test_empty_query(self):
+        self.assertEqual(self.suggest(' '), {'users': [], 'groups': []})
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..cards import attach_cards, card_key
+from ..models import Comment, Group, Post, User
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        cls.group = Group.objects.create(title='testgroup', slug='slug')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_version(self):
+        return Post.objects.get(id=self.post.id).version
+
+    def test_cached_card_is_shared_between_users(self):
+        url = reverse('group', args=(self.group.slug,))
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Редактировать')
+        html = cache.get(card_key(self.post))
+        self.assertIn('Тестовый текст', html)
+        self.assertNotIn('Редактировать', html)
+        response = Client().get(url)
+        self.assertContains(response, 'Тестовый текст')
+        self.assertNotContains(response, 'Редактировать')
+
+    def test_page_of_cards_is_one_cache_round_trip(self):
+        posts = [Post.objects.create(text=f'текст {i}', author=self.user)
+                 for i in range(3)]
+        attach_cards(posts)
+        cache.set(card_key(posts[0]), 'из кеша')
+        attach_cards(posts)
+        self.assertEqual(posts[0].card_html, 'из кеша')
+
+    def test_version_changes_on_edit_group_and_comments(self):
+        version = self.get_version()
+        self.authorized_client.post(
+            reverse('edit_post', args=(self.user.username, self.post.id)),
+            {'text': 'Новый текст', 'group': self.group.id})
+        self.assertEqual(self.get_version(), version + 1)
+        comment = Comment.objects.create(post=self.post, author=self.user,
+                                         text='комментарий')
+        comment.delete()
+        self.group.title = 'newtitle'
+        self.group.save()
+        self.assertEqual(self.get_version(), version + 4)
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'Новый текст')
+        self.assertContains(response, 'newtitle')
+
+    def test_save_does_not_overwrite_counters(self):
+        stale = Post.objects.get(id=self.post.id)
+        Comment.objects.create(post=self.post, author=self.user, text='к')
+        stale.text = 'правка'
+        stale.save()
+        fresh = Post.objects.get(id=self.post.id)
+        self.assertEqual(fresh.comment_count, 1)
+        self.assertEqual(fresh.text, 'правка')
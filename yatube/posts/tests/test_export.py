@@ -0,0 +1,92 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Group, Post, User
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        cls.other = User.objects.create_user(username='otheruser')
+        cls.group = Group.objects.create(title='Кошки', slug='cats',
+                                         description='')
+        cls.old = Post.objects.create(text='Старый пост', author=cls.user,
+                                      group=cls.group)
+        cls.old.pub_date = timezone.make_aware(datetime(2020, 1, 1))
+        cls.old.save()
+        cls.new = Post.objects.create(text='Новый пост', author=cls.other)
+        cls.comment = Comment.objects.create(post=cls.old, author=cls.other,
+                                             text='Комментарий')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get(self, name, **params):
+        response = self.authorized_client.get(reverse(name), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_posts_ndjson(self):
+        response, content = self.get('export_posts')
+        self.assertEqual(response['Content-Type'],
+                         'application/x-ndjson; charset=utf-8')
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([record['id'] for record in records],
+                         [self.old.id, self.new.id])
+        self.assertEqual(records[0]['group'], 'cats')
+        self.assertEqual(datetime.fromisoformat(records[0]['pub_date']),
+                         self.old.pub_date)
+
+    def test_filters(self):
+        _, content = self.get('export_posts', author='testuser')
+        self.assertEqual(len(content.splitlines()), 1)
+        _, content = self.get('export_posts', group='cats', since='2019-12-31')
+        self.assertEqual(json.loads(content)['id'], self.old.id)
+        _, content = self.get('export_posts', since='2021-01-01')
+        self.assertEqual(json.loads(content)['id'], self.new.id)
+        response = self.authorized_client.get(reverse('export_posts'),
+                                              {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_comments_csv_gzip(self):
+        response, content = self.get('export_comments', format='csv',
+                                     gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('comments.csv.gz', response['Content-Disposition'])
+        rows = list(csv.DictReader(StringIO(gzip.decompress(content)
+                                            .decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['post'], str(self.old.id))
+        self.assertEqual(rows[0]['author'], 'otheruser')
+
+    def test_guest_redirected(self):
+        response = Client().get(reverse('export_posts'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_command_output_can_be_imported(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'export.ndjson')
+        try:
+            call_command('export_posts', path, stdout=StringIO())
+            Post.objects.all().delete()
+            call_command('import_posts', path, stdout=StringIO())
+        finally:
+            os.remove(path)
+            os.rmdir(directory)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Новый пост', 'Старый пост'])
+        self.assertEqual(Comment.objects.get().post.text, 'Старый пост')
@@ -0,0 +1,49 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from .utils import FeedQueriesMixin
+
+
+class FeedQueriesTest(FeedQueriesMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        cls.author = User.objects.create_user(username='testauthor')
+        cls.group = Group.objects.create(title='testgroup', slug='slug',
+                                         description='описание')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Post.objects.create(text='Тестовый текст', author=cls.author,
+                            group=cls.group)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def add_posts(self):
+        for i in range(9):
+            group = Group.objects.create(title=f'группа {i}', slug=f'g{i}')
+            post = Post.objects.create(text=f'текст {i}', author=self.author,
+                                       group=group if i % 2 else self.group)
+            Comment.objects.create(post=post, author=self.user, text='к')
+
+    # Сессия и пользователь, поколения из общего кеша + запросы ленты
+    def test_index_queries(self):
+        self.assertFeedQueries(self.authorized_client, reverse('index'), 4,
+                               self.add_posts)
+
+    def test_group_queries(self):
+        self.assertFeedQueries(self.authorized_client,
+                               reverse('group', args=(self.group.slug,)), 5,
+                               self.add_posts)
+
+    def test_profile_queries(self):
+        self.assertFeedQueries(self.authorized_client,
+                               reverse('profile',
+                                       args=(self.author.username,)), 7,
+                               self.add_posts)
+
+    def test_follow_index_queries(self):
+        self.assertFeedQueries(self.authorized_client,
+                               reverse('follow_index'), 5, self.add_posts)
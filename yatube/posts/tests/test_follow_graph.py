@@ -0,0 +1,64 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.cache.backends.db import DatabaseCache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..follow_graph import following_status, is_following
+from ..models import Follow, User
+from .utils import app_queries
+
+
+class FollowGraphTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.authors = [User.objects.create_user(username=f'author{i}')
+                        for i in range(5)]
+        for author in self.authors[1::2]:
+            Follow.objects.create(user=self.user, author=author)
+
+    def test_batch_status_uses_one_query_then_cache(self):
+        ids = [author.id for author in self.authors]
+        with CaptureQueriesContext(connection) as context:
+            status = following_status(self.user, ids)
+        self.assertEqual(len(app_queries(context)), 1)
+        self.assertEqual(status, {ids[0]: False, ids[1]: True,
+                                  ids[2]: False, ids[3]: True,
+                                  ids[4]: False})
+        # Дальше — одно чтение общего кеша
+        with CaptureQueriesContext(connection) as context:
+            following_status(self.user, ids + [0, 10 ** 9])
+        self.assertEqual(len(context), 1)
+        self.assertEqual(app_queries(context), [])
+
+    def test_invalidation_from_another_worker(self):
+        author = self.authors[0]
+        self.assertFalse(is_following(self.user, author.id))
+        # Другой процесс: свой экземпляр кеша поверх той же таблицы
+        other = DatabaseCache(settings.CACHES['shared']['LOCATION'], {})
+        with mock.patch('posts.follow_graph.shared_cache',
+                        return_value=other):
+            Follow.objects.create(user=self.user, author=author)
+        self.assertTrue(is_following(self.user, author.id))
+
+    def test_follow_and_unfollow_invalidate(self):
+        client = Client()
+        client.force_login(self.user)
+        author = self.authors[0]
+        self.assertFalse(is_following(self.user, author.id))
+        client.get(reverse('profile_follow', args=(author.username,)))
+        self.assertTrue(is_following(self.user, author.id))
+        client.get(reverse('profile_unfollow', args=(author.username,)))
+        self.assertFalse(is_following(self.user, author.id))
+
+    def test_anonymous_follows_nobody(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                following_status(AnonymousUser(), [self.authors[1].id]),
+                {self.authors[1].id: False})
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -29,6 +30,9 @@ class PostFormTests(TestCase):
             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
             b'\x0A\x00\x3B'
         )
+        # Хранилище кладёт файл под sha256 содержимого
+        digest = hashlib.sha256(small_gif).hexdigest()
+        cls.image_name = f'posts/{digest[:2]}/{digest}.gif'
         cls.image = SimpleUploadedFile(
             name='small.gif',
             content=small_gif,
@@ -62,7 +66,7 @@ class PostFormTests(TestCase):
         self.assertEqual(Post.objects.count(), post_count + 1)
         self.assertTrue(Post.objects.filter(text=form_data['text'],
                                             group=form_data['group'],
-                                            image='posts/small.gif').exists())
+                                            image=self.image_name).exists())
         self.assertTrue(
             response.context['page'][0].image.name, self.image.name)
 
@@ -83,3 +87,15 @@ class PostFormTests(TestCase):
         self.assertTrue(Post.objects.filter(text=form_data['text'],
                                             id=self.post.id,
                                             group=self.group).exists())
+
+    @override_settings(IMAGE_MAX_PIXELS=1)
+    def test_image_over_pixel_limit_rejected(self):
+        post_count = Post.objects.count()
+        image = SimpleUploadedFile('big.gif', self.image.file.getvalue(),
+                                   content_type='image/gif')
+        response = self.authorized_client.post(
+            reverse('new_post'), data={'text': self.text, 'image': image})
+        self.assertEqual(Post.objects.count(), post_count)
+        self.assertEqual(
+            response.context['form'].errors['image'][0].split()[0],
+            'Картинка')
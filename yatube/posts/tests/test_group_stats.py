@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..group_stats import refresh
+from ..models import Group, GroupStats, Post, User
+
+
+class GroupStatsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        self.cats = Group.objects.create(title='Коты', slug='cats')
+        self.dogs = Group.objects.create(title='Собаки', slug='dogs')
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def test_posts_update_stats(self):
+        Post.objects.create(text='раз', author=self.author, group=self.cats)
+        last = Post.objects.create(text='два', author=self.other,
+                                   group=self.cats)
+        stats = self.stats(self.cats)
+        self.assertEqual(stats.post_count, 2)
+        self.assertEqual(stats.last_post_date, last.pub_date)
+        self.assertEqual(stats.active_authors, 2)
+        self.assertEqual(self.stats(self.dogs).post_count, 0)
+
+    def test_move_and_delete(self):
+        first = Post.objects.create(text='раз', author=self.author,
+                                    group=self.cats)
+        second = Post.objects.create(text='два', author=self.author,
+                                     group=self.cats)
+        second.group = self.dogs
+        second.save()
+        self.assertEqual(self.stats(self.cats).post_count, 1)
+        self.assertEqual(self.stats(self.cats).last_post_date, first.pub_date)
+        self.assertEqual(self.stats(self.dogs).post_count, 1)
+        first.delete()
+        stats = self.stats(self.cats)
+        self.assertEqual(stats.post_count, 0)
+        self.assertIsNone(stats.last_post_date)
+        self.assertEqual(stats.active_authors, 0)
+
+    def test_refresh_drops_inactive_authors(self):
+        post = Post.objects.create(text='раз', author=self.author,
+                                   group=self.cats)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=timezone.now() - timedelta(days=8))
+        GroupStats.objects.filter(group=self.cats).delete()
+        refresh()
+        stats = self.stats(self.cats)
+        self.assertEqual(stats.post_count, 1)
+        self.assertEqual(stats.active_authors, 0)
+
+    def test_group_list_sorting(self):
+        Post.objects.create(text='раз', author=self.author, group=self.dogs)
+        Post.objects.create(text='два', author=self.author, group=self.dogs)
+        Post.objects.create(text='три', author=self.author, group=self.cats)
+        expected = {
+            'title': ['cats', 'dogs'],
+            'size': ['dogs', 'cats'],
+            'activity': ['cats', 'dogs'],
+            'unknown': ['cats', 'dogs'],
+        }
+        for sort, slugs in expected.items():
+            with self.subTest(sort=sort):
+                response = self.client.get(reverse('group_list'),
+                                           {'sort': sort})
+                self.assertEqual(
+                    [stats.group.slug for stats in response.context['page']],
+                    slugs)
@@ -0,0 +1,58 @@
+from django.test import TestCase, override_settings
+
+from ..hyperloglog import HyperLogLog
+from ..models import Ip, Post, User, ViewSketch
+from ..sketches import unique_viewers
+from ..view_buffer import view_buffer
+
+
+class HyperLogLogTest(TestCase):
+    def test_estimate_is_close_to_cardinality(self):
+        for cardinality in (10, 1000, 50000):
+            with self.subTest(cardinality=cardinality):
+                sketch = HyperLogLog()
+                sketch.update(f'10.0.{i}' for i in range(cardinality))
+                sketch.update(f'10.0.{i}' for i in range(cardinality))
+                self.assertAlmostEqual(sketch.count(), cardinality,
+                                       delta=cardinality * 0.05)
+
+    def test_merge_equals_union(self):
+        left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        left.update(range(0, 3000))
+        right.update(range(2000, 5000))
+        union.update(range(0, 5000))
+        self.assertEqual(left.merge(right).registers, union.registers)
+
+    def test_bytes_roundtrip(self):
+        sketch = HyperLogLog(10)
+        sketch.update(range(100))
+        restored = HyperLogLog.from_bytes(sketch.to_bytes())
+        self.assertEqual(restored.precision, 10)
+        self.assertEqual(restored.count(), sketch.count())
+
+
+@override_settings(VIEW_COUNT_MODE='approximate')
+class ApproximateViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        cls.posts = [Post.objects.create(text=f'текст {i}', author=cls.user)
+                     for i in range(2)]
+
+    def setUp(self):
+        view_buffer.clear()
+
+    def test_flush_updates_sketch_instead_of_ip_rows(self):
+        first, second = self.posts
+        first.views.add(Ip.objects.create(ip='seed'))
+        for i in range(200):
+            view_buffer.record(first.id, f'10.0.0.{i}')
+            view_buffer.record(second.id, f'10.0.0.{i + 100}')
+        view_buffer.flush()
+        self.assertEqual(Ip.objects.count(), 1)
+        self.assertEqual(ViewSketch.objects.count(), 2)
+        first.refresh_from_db()
+        self.assertAlmostEqual(first.total_views(), 201, delta=10)
+        self.assertAlmostEqual(
+            unique_viewers(self.user.posts.all()), 301, delta=15)
@@ -0,0 +1,100 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import search
+from ..importer import FIELDS
+from ..models import (Comment, Follow, Group, GroupStats, ImportCheckpoint,
+                      Post, Timeline, User, UserStats)
+
+RECORDS = [
+    {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+    {'type': 'post', 'id': 'p1', 'author': 'writer', 'group': 'cats',
+     'group_title': 'Кошки', 'text': 'Первая кошка',
+     'pub_date': '2024-01-01T10:00:00'},
+    {'type': 'post', 'id': 'p2', 'author': 'writer',
+     'text': 'Вторая собака', 'pub_date': '2024-01-02T10:00:00+00:00'},
+    {'type': 'post', 'author': 'writer'},
+    {'type': 'comment', 'post': 'p1', 'author': 'reader',
+     'text': 'Отличная кошка', 'pub_date': '2024-01-03T10:00:00'},
+    {'type': 'comment', 'post': 'p404', 'author': 'reader', 'text': 'Мимо'},
+]
+
+
+class ImportPostsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def write_ndjson(self, records, name='posts.ndjson'):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+    def import_posts(self, path, **options):
+        call_command('import_posts', path, stdout=StringIO(), **options)
+
+    def test_records_are_imported_with_derived_state(self):
+        self.import_posts(self.write_ndjson(RECORDS), batch_size=2)
+        writer = User.objects.get(username='writer')
+        reader = User.objects.get(username='reader')
+        first, second = Post.objects.filter(author=writer).order_by('id')
+        self.assertEqual(first.group, Group.objects.get(slug='cats'))
+        self.assertEqual(first.pub_date.isoformat(),
+                         '2024-01-01T07:00:00+00:00')
+        self.assertEqual(second.pub_date.isoformat(),
+                         '2024-01-02T10:00:00+00:00')
+        self.assertEqual(first.comment_count, 1)
+        self.assertEqual(Comment.objects.get().post, first)
+        self.assertTrue(Follow.objects.filter(user=reader,
+                                              author=writer).exists())
+        self.assertEqual(
+            set(Timeline.objects.filter(user=reader)
+                .values_list('post', flat=True)),
+            {first.id, second.id})
+        self.assertEqual(
+            list(search.filter_matching(Post.objects.all(), 'собака')),
+            [second])
+        stats = UserStats.objects.get(user=writer)
+        self.assertEqual((stats.post_count, stats.follower_count,
+                          stats.comments_received), (2, 1, 1))
+        self.assertEqual(UserStats.objects.get(user=reader).following_count,
+                         1)
+        group_stats = GroupStats.objects.get(group__slug='cats')
+        self.assertEqual(group_stats.post_count, 1)
+        self.assertEqual(group_stats.last_post_date, first.pub_date)
+
+    def test_restart_continues_after_last_batch(self):
+        first_half = self.write_ndjson(RECORDS[:3], 'first.ndjson')
+        self.import_posts(first_half, source='dump')
+        self.assertEqual(Post.objects.count(), 2)
+        self.import_posts(self.write_ndjson(RECORDS), source='dump')
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post.text, 'Первая кошка')
+        self.assertEqual(ImportCheckpoint.objects.get(source='dump').position,
+                         len(RECORDS))
+
+    def test_csv_format(self):
+        path = os.path.join(self.directory, 'posts.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(file, FIELDS)
+            writer.writeheader()
+            writer.writerows(RECORDS[:3])
+        self.import_posts(path)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Вторая собака', 'Первая кошка'])
+        self.assertEqual(Follow.objects.count(), 1)
@@ -1,6 +1,16 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import DatabaseError, connection, transaction
+from django.db.models.signals import pre_delete
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post, User
+from .. import page_cache
+from ..models import Comment, Follow, Group, Ip, Post, User, UserStats
+from ..signals import deleting
+from .utils import app_queries
 
 
 class PostModelTest(TestCase):
@@ -20,3 +30,147 @@ class PostModelTest(TestCase):
     def test_post_text(self):
         test_text = self.post.text
         self.assertEqual(test_text, str(self.post))
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def test_comment_count_follows_comments(self):
+        comment = Comment.objects.create(post=self.post, author=self.user,
+                                         text='комментарий')
+        Comment.objects.create(post=self.post, author=self.user, text='ещё')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_view_count_counts_unique_ips(self):
+        first, second = Ip.objects.create(ip='1'), Ip.objects.create(ip='2')
+        self.post.views.add(first)
+        self.post.views.add(first, second)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.total_views(), 2)
+
+    def test_reconcile_counters_fixes_drift(self):
+        Comment.objects.create(post=self.post, author=self.user, text='к')
+        self.post.views.add(Ip.objects.create(ip='1'))
+        Post.objects.update(comment_count=7, view_count=0)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.post.view_count, 1)
+
+    def test_reconcile_counters_invalidates_cards_and_pages(self):
+        Post.objects.update(comment_count=7)
+        self.post.refresh_from_db()
+        scopes = ['index', 'profile:testuser']
+        before = page_cache.get_generations(scopes)
+        call_command('reconcile_counters', stdout=StringIO())
+        version = self.post.version
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, version + 1)
+        for old, new in zip(before, page_cache.get_generations(scopes)):
+            self.assertGreater(new, old)
+
+    def test_failed_delete_is_forgotten_after_request(self):
+        def fail(**kwargs):
+            raise DatabaseError
+
+        Comment.objects.create(post=self.post, author=self.user, text='к')
+        # Удаление падает после pre_delete: post_delete не придёт
+        pre_delete.connect(fail, sender=Post)
+        try:
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                Post.objects.get(pk=self.post.pk).delete()
+        finally:
+            pre_delete.disconnect(fail, sender=Post)
+        self.assertIn(self.post.pk, deleting.posts)
+        request_finished.send(sender=None)
+        self.assertEqual(deleting.posts, set())
+        Comment.objects.get(post=self.post).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+
+class UserStatsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_signals_keep_counts(self):
+        post = Post.objects.create(text='текст', author=self.author)
+        Post.objects.create(text='ещё', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='к')
+        stats = self.stats(self.author)
+        self.assertEqual((stats.post_count, stats.follower_count,
+                          stats.following_count, stats.comments_received),
+                         (2, 1, 0, 1))
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        follow.delete()
+        post.delete()
+        stats = self.stats(self.author)
+        self.assertEqual((stats.post_count, stats.follower_count,
+                          stats.comments_received), (1, 0, 0))
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_cascaded_rows_do_not_add_queries(self):
+        readers = [User.objects.create_user(username=f'reader{i}')
+                   for i in range(3)]
+        counts = []
+        for number in (1, 3):
+            post = Post.objects.create(text='текст', author=self.author)
+            for reader in readers[:number]:
+                Comment.objects.create(post=post, author=reader, text='к')
+            user = User.objects.create_user(username=f'gone{number}')
+            for reader in readers[:number]:
+                Follow.objects.create(user=reader, author=user)
+                Follow.objects.create(user=user, author=reader)
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+                user.delete()
+            # Сброс поколений в общем кеше — по странице на каждый
+            # затронутый профиль, это не построчные запросы
+            counts.append(len(app_queries(context)))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self.stats(self.author).comments_received, 0)
+        for reader in readers:
+            stats = self.stats(reader)
+            self.assertEqual((stats.follower_count, stats.following_count),
+                             (0, 0))
+
+    def test_user_delete_settles_comments_on_other_posts(self):
+        post = Post.objects.create(text='текст', author=self.author)
+        Comment.objects.create(post=post, author=self.author, text='сам')
+        Comment.objects.create(post=post, author=self.reader, text='к')
+        Comment.objects.create(post=post, author=self.reader, text='ещё')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        stats = self.stats(self.author)
+        self.assertEqual((stats.follower_count, stats.comments_received),
+                         (0, 1))
+
+    def test_reconcile_user_stats_fixes_drift(self):
+        Post.objects.create(text='текст', author=self.author)
+        UserStats.objects.filter(user=self.author).update(post_count=5)
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('reconcile_user_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.assertEqual(self.stats(self.reader).post_count, 0)
+
+    def test_reconcile_user_stats_invalidates_profile(self):
+        UserStats.objects.filter(user=self.author).update(post_count=5)
+        before, = page_cache.get_generations(['profile:author'])
+        call_command('reconcile_user_stats', stdout=StringIO())
+        after, = page_cache.get_generations(['profile:author'])
+        self.assertGreater(after, before)
@@ -0,0 +1,150 @@
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..models import Comment, Follow, Group, Post, User
+from ..page_cache import generation_key
+from ..view_buffer import view_buffer
+from .utils import app_queries
+
+
+class GenerationPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='testgroup', slug='slug')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.user, group=cls.group)
+        cls.urls = (
+            reverse('index'),
+            reverse('group', args=(cls.group.slug,)),
+            reverse('profile', args=(cls.user.username,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_pages_are_served_from_cache_until_change(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertIsNotNone(self.guest_client.get(url).context)
+                self.assertIsNone(self.guest_client.get(url).context)
+
+    def test_new_post_appears_immediately(self):
+        for url in self.urls:
+            self.guest_client.get(url)
+        Post.objects.create(text='Свежий пост', author=self.user,
+                            group=self.group)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Свежий пост')
+
+    def test_comment_and_follow_invalidate_pages(self):
+        url = reverse('profile', args=(self.user.username,))
+        self.guest_client.get(url)
+        Comment.objects.create(post=self.post, author=self.reader, text='к')
+        self.assertContains(self.guest_client.get(url), 'Комментариев: 1')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertContains(self.guest_client.get(url), 'Подписчиков: 1')
+
+    def test_group_edit_invalidates_index(self):
+        self.guest_client.get(reverse('index'))
+        self.group.title = 'newtitle'
+        self.group.save()
+        self.assertContains(self.guest_client.get(reverse('index')),
+                            'newtitle')
+
+    def test_anonymous_and_authorized_variants_are_separate(self):
+        url = reverse('index')
+        self.assertContains(self.authorized_client.get(url), 'Редактировать')
+        self.assertNotContains(self.guest_client.get(url), 'Редактировать')
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        self.assertNotContains(reader_client.get(url), 'Редактировать')
+
+    def test_generations_are_shared_between_workers(self):
+        self.guest_client.get(reverse('index'))
+        key = generation_key('index')
+        self.assertIsNone(cache.get(key))
+        generation = caches['shared'].get(key)
+        Post.objects.create(text='Свежий пост', author=self.user)
+        self.assertGreater(caches['shared'].get(key), generation)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        cls.group = Group.objects.create(title='testgroup', slug='slug')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.user, group=cls.group)
+        cls.urls = (
+            reverse('index'),
+            reverse('group', args=(cls.group.slug,)),
+            reverse('profile', args=(cls.user.username,)),
+            reverse('post', args=(cls.user.username, cls.post.id)),
+        )
+
+    def setUp(self):
+        cache.clear()
+        view_buffer.clear()
+        self.guest_client = Client()
+
+    def tearDown(self):
+        view_buffer.clear()
+
+    def test_revalidation_reads_only_generations(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                # Поколения в таблице базы: один get_many, без записей
+                with CaptureQueriesContext(connection) as context:
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(len(context), 1)
+                self.assertEqual(app_queries(context), [])
+
+    def test_if_modified_since_is_not_answered_across_login(self):
+        authorized_client = Client()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = authorized_client.get(url)
+                self.assertNotIn('Last-Modified', response)
+                authorized_client.force_login(self.user)
+                response = authorized_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=http_date())
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Редактировать')
+                authorized_client.logout()
+
+    def test_etag_changes_with_content_and_user(self):
+        etags = [self.guest_client.get(url)['ETag'] for url in self.urls]
+        authorized_client = Client()
+        authorized_client.force_login(self.user)
+        for url, etag in zip(self.urls, etags):
+            response = authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+        Comment.objects.create(post=self.post, author=self.user, text='к')
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url,
+                                                 HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_revalidated_post_view_is_counted(self):
+        url = self.urls[-1]
+        etag = self.guest_client.get(url)['ETag']
+        view_buffer.clear()
+        self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(view_buffer), 1)
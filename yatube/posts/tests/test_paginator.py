@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models import Group, Post, User
+from ..paginator import ELLIPSIS, CachedCountPaginator, CursorPaginator
+from .utils import app_queries
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        Post.objects.bulk_create(
+            Post(text=f'текст {i}', author=cls.user) for i in range(25))
+        # Одинаковые pub_date: порядок должен добиваться по id
+        same_date = timezone.now() - timedelta(days=1)
+        Post.objects.update(pub_date=same_date)
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def get_page(self, cursor=None):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        return paginator.get_page(cursor)
+
+    def test_pages_walk_forward_and_back(self):
+        first = self.get_page()
+        self.assertEqual(list(first), self.ordered[:10])
+        self.assertFalse(first.has_previous())
+        self.assertIsNone(first.previous_cursor)
+        second = self.get_page(first.next_cursor)
+        self.assertEqual(list(second), self.ordered[10:20])
+        third = self.get_page(second.next_cursor)
+        self.assertEqual(list(third), self.ordered[20:])
+        self.assertFalse(third.has_next())
+        self.assertIsNone(third.next_cursor)
+        back = self.get_page(third.previous_cursor)
+        self.assertEqual(list(back), self.ordered[10:20])
+        self.assertEqual(list(self.get_page(back.previous_cursor)),
+                         self.ordered[:10])
+
+    def test_deep_page_is_single_query(self):
+        cursor = self.get_page().next_cursor
+        with self.assertNumQueries(1):
+            self.get_page(cursor)
+
+    def test_broken_cursor_returns_first_page(self):
+        for cursor in ('garbage', 'bnwx', '!!!'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(list(self.get_page(cursor)),
+                                 self.ordered[:10])
+
+
+class CachedCountPaginatorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        Group.objects.bulk_create(
+            Group(title=f'группа {i}', slug=f'group-{i}') for i in range(30))
+
+    def test_count_is_cached_until_write(self):
+        self.assertEqual(
+            CachedCountPaginator(Group.objects.all(), 10).count, 30)
+        # COUNT(*) не выполняется, читается только поколение модели
+        with CaptureQueriesContext(connection) as context:
+            count = CachedCountPaginator(Group.objects.all(), 10).count
+        self.assertEqual(count, 30)
+        self.assertEqual(app_queries(context), [])
+        Group.objects.create(title='новая', slug='new')
+        self.assertEqual(
+            CachedCountPaginator(Group.objects.all(), 10).count, 31)
+
+    def test_count_depends_on_query(self):
+        self.assertEqual(
+            CachedCountPaginator(Group.objects.all(), 10).count, 30)
+        filtered = Group.objects.filter(slug__startswith='group-1')
+        self.assertEqual(CachedCountPaginator(filtered, 10).count, 11)
+
+    def test_page_window(self):
+        paginator = CachedCountPaginator(Group.objects.all(), 1)
+        cases = {
+            1: [1, 2, 3, ELLIPSIS, 30],
+            5: [1, ELLIPSIS, 3, 4, 5, 6, 7, ELLIPSIS, 30],
+            4: [1, 2, 3, 4, 5, 6, ELLIPSIS, 30],
+            30: [1, ELLIPSIS, 28, 29, 30],
+        }
+        for number, window in cases.items():
+            with self.subTest(number=number):
+                self.assertEqual(paginator.get_page_window(number), window)
+        short = CachedCountPaginator(Group.objects.all(), 5)
+        self.assertEqual(short.get_page(2).page_window, [1, 2, 3, 4, 5, 6])
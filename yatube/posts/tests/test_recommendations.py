@@ -0,0 +1,66 @@
+from io import StringIO
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Recommendation, User
+from ..recommendations import recommend
+
+
+class RecommendTest(TestCase):
+    def test_friends_of_friends_and_cofollow(self):
+        # 1 читает 2; 2 читает 3 и 4; 5 читает 2 и 6, поэтому похож на 1
+        followers = np.array([1, 2, 2, 5, 5])
+        authors = np.array([2, 3, 4, 2, 6])
+        users, suggested, scores, ranks = recommend(
+            followers, authors, k=2, cofollow_weight=0.5, max_followers=10)
+        first = users == 1
+        self.assertEqual(suggested[first].tolist(), [3, 4])
+        self.assertEqual(ranks[first].tolist(), [0, 1])
+        self.assertNotIn(2, suggested[first].tolist())
+        self.assertNotIn(5, suggested[users == 5].tolist())
+        users, suggested, scores, _ = recommend(
+            followers, authors, k=5, cofollow_weight=0.5, max_followers=10)
+        self.assertEqual(suggested[users == 1].tolist(), [3, 4, 6])
+        self.assertEqual(scores[users == 1].tolist(), [1.0, 1.0, 0.5])
+
+    def test_popular_authors_do_not_make_readers_similar(self):
+        followers = np.array([1, 5, 5])
+        authors = np.array([2, 2, 6])
+        users, suggested, *_ = recommend(
+            followers, authors, k=5, cofollow_weight=0.5, max_followers=1)
+        self.assertNotIn(6, suggested[users == 1].tolist())
+
+    def test_empty_graph(self):
+        empty = np.array([], dtype=np.int64)
+        users, *_ = recommend(empty, empty, k=5, cofollow_weight=0.5,
+                              max_followers=10)
+        self.assertEqual(len(users), 0)
+
+
+class RecommendAuthorsCommandTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader, self.friend, self.writer = (
+            User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'writer'))
+        Follow.objects.create(user=self.reader, author=self.friend)
+        Follow.objects.create(user=self.friend, author=self.writer)
+
+    def test_command_stores_and_pages_show_suggestions(self):
+        client = Client()
+        client.force_login(self.reader)
+        client.get(reverse('profile', args=(self.reader.username,)))
+        call_command('recommend_authors', stdout=StringIO())
+        self.assertEqual(
+            list(Recommendation.objects.filter(user=self.reader)
+                 .values_list('author__username', flat=True)),
+            ['writer'])
+        for url in (reverse('profile', args=(self.reader.username,)),
+                    reverse('follow_index')):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertContains(response, '@writer')
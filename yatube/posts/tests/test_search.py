@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.contrib.admin.sites import site
+from django.core.management import call_command
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+from ..search import SearchPaginator, filter_matching
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        cls.best = Post.objects.create(
+            text='Кошка, кошка и ещё раз кошка', author=cls.user)
+        cls.other = Post.objects.create(
+            text='Собака встретила кошку. Кошка убежала', author=cls.user)
+        cls.dog = Post.objects.create(text='Просто собака', author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, cursor=None, per_page=10):
+        return SearchPaginator(query, per_page).get_page(cursor)
+
+    def test_results_are_ranked_and_highlighted(self):
+        page = self.search('КОШКА')
+        self.assertEqual(list(page), [self.best, self.other])
+        self.assertIn('<mark>Кошка</mark>', page[0].snippet)
+
+    def test_snippet_escapes_post_text(self):
+        Post.objects.create(text='<script>кошка</script>', author=self.user)
+        snippets = [post.snippet for post in self.search('кошка')]
+        self.assertIn('&lt;script&gt;<mark>кошка</mark>&lt;/script&gt;',
+                      snippets)
+
+    def test_cursor_pages(self):
+        first = self.search('кошка собака', per_page=1)
+        self.assertEqual(list(first), [self.other])
+        self.assertIsNone(first.next_cursor)
+        first = self.search('собака', per_page=1)
+        second = self.search('собака', first.next_cursor, per_page=1)
+        self.assertEqual({*first, *second}, {self.other, self.dog})
+        back = self.search('собака', second.previous_cursor, per_page=1)
+        self.assertEqual(list(back), list(first))
+
+    def test_index_follows_edits_and_deletes(self):
+        dog = Post.objects.get(id=self.dog.id)
+        dog.text = 'Теперь тут хомяк'
+        dog.save()
+        self.assertEqual(list(self.search('хомяк')), [dog])
+        self.assertEqual(list(self.search('собака')), [self.other])
+        dog.delete()
+        self.assertEqual(list(self.search('хомяк')), [])
+
+    def test_fts_syntax_in_query_is_harmless(self):
+        for query in ('"', 'кошка AND OR (', '*', ''):
+            with self.subTest(query=query):
+                response = self.guest_client.get(reverse('search'),
+                                                 {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_rebuild_command(self):
+        Post.objects.filter(id=self.dog.id).update(text='попугай')
+        self.assertEqual(list(self.search('попугай')), [])
+        call_command('rebuild_search_index', batch_size=2, stdout=StringIO())
+        self.assertEqual(list(self.search('попугай')), [self.dog])
+
+    def test_admin_search_uses_index(self):
+        request = RequestFactory().get('/')
+        queryset, _ = site._registry[Post].get_search_results(
+            request, Post.objects.all(), 'убежала')
+        self.assertEqual(list(queryset), [self.other])
+        self.assertEqual(
+            list(filter_matching(Post.objects.order_by('id'), 'кошка')),
+            [self.best, self.other])
+
+    def test_admin_search_punctuation_only(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        for term in ('!!!', '-'):
+            with self.subTest(term=term):
+                response = client.get(
+                    reverse('admin:posts_post_changelist'), {'q': term})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['cl'].result_count, 0)
@@ -0,0 +1,142 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from ..models import Post, StoredFile, User
+from ..storage import content_storage
+
+TEMP_MEDIA = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='photo.jpg', color='navy', size=(1200, 800),
+               stripe=(0, 0, 400, 800)):
+    buffer = BytesIO()
+    image = Image.new('RGB', size, color)
+    # Полоса даёт картинке различимый перцептивный хеш
+    image.paste('white', stripe)
+    image.save(buffer, 'JPEG', quality=90)
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, THUMBNAIL_WORKERS=0,
+                   IMAGE_PROCESSES=0, POST_IMAGE_WIDTHS=(480, 960))
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser')
+
+    def create_post(self, image):
+        return Post.objects.get(id=Post.objects.create(
+            text='текст', author=self.user, image=image).id)
+
+    def test_same_bytes_share_one_file(self):
+        first = self.create_post(make_image('a.jpg'))
+        second = self.create_post(make_image('b.jpg'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}'
+                                           r'\.jpg$')
+        self.assertTrue(content_storage.exists(first.image.name))
+        self.assertEqual(
+            StoredFile.objects.get(name=first.image.name).refcount, 2)
+
+    def test_duplicates_share_variants(self):
+        first = self.create_post(make_image('a.jpg'))
+        second = self.create_post(make_image('b.jpg'))
+        self.assertEqual(first.thumbnail_data, second.thumbnail_data)
+        self.assertEqual(
+            StoredFile.objects.get(name=first.image.name).thumbnail_data,
+            first.thumbnail_data)
+
+    def test_refcount_follows_edits_and_deletes(self):
+        first = self.create_post(make_image())
+        second = self.create_post(make_image())
+        name = first.image.name
+        first.image = make_image(color='green')
+        first.save()
+        self.assertEqual(StoredFile.objects.get(name=name).refcount, 1)
+        self.assertEqual(
+            StoredFile.objects.get(name=first.image.name).refcount, 1)
+        second.delete()
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_jpeg_metadata_stripped_orientation_kept(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010E] = 'дача, координаты'
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), 'navy').save(
+            buffer, 'JPEG', exif=exif.tobytes(), comment=b'camera')
+        post = self.create_post(SimpleUploadedFile(
+            'phone.jpg', buffer.getvalue(), content_type='image/jpeg'))
+        with content_storage.open(post.image.name) as file:
+            data = file.read()
+        self.assertNotIn(b'camera', data)
+        with Image.open(BytesIO(data)) as image:
+            self.assertEqual(dict(image.getexif()), {0x0112: 6})
+        # Ориентация применена: кадр из портретного исходника
+        self.assertEqual(post.thumbnail_data['card']['width'], 480)
+
+    @override_settings(IMAGE_PHASH=True)
+    def test_similar_image_is_marked(self):
+        original = self.create_post(make_image())
+        buffer = BytesIO()
+        with Image.open(original.image.path) as image:
+            image.resize((600, 400)).save(buffer, 'JPEG', quality=50)
+        resized = self.create_post(SimpleUploadedFile(
+            'small.jpg', buffer.getvalue(), content_type='image/jpeg'))
+        other = self.create_post(make_image(stripe=(0, 500, 1200, 800)))
+        self.assertNotEqual(original.image.name, resized.image.name)
+        self.assertEqual(
+            StoredFile.objects.get(name=resized.image.name).similar_to_id,
+            original.image.name)
+        self.assertIsNone(
+            StoredFile.objects.get(name=other.image.name).similar_to_id)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, THUMBNAIL_WORKERS=0,
+                   IMAGE_PROCESSES=0, POST_IMAGE_WIDTHS=(480, 960))
+class StoredFileCleanupTest(TransactionTestCase):
+    # Файлы удаляются в on_commit, которого TestCase не выполняет
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser')
+
+    def test_last_reference_deletes_original_and_variants(self):
+        post = Post.objects.create(text='текст', author=self.user,
+                                   image=make_image())
+        post = Post.objects.get(id=post.id)
+        files = [post.image.name]
+        variants = post.thumbnail_data['files']
+        post.image = make_image(color='green')
+        post.save()
+        self.assertFalse(content_storage.exists(files[0]))
+        self.assertFalse(any(default_storage.exists(name)
+                             for name in variants))
+        self.assertTrue(content_storage.exists(post.image.name))
+
+    def test_shared_file_survives_one_delete(self):
+        first = Post.objects.create(text='текст', author=self.user,
+                                    image=make_image())
+        Post.objects.create(text='текст', author=self.user,
+                            image=make_image())
+        first.delete()
+        self.assertTrue(content_storage.exists(first.image.name))
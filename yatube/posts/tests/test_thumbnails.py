@@ -0,0 +1,163 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from ..cards import render_card
+from ..models import Post, User
+from ..thumbnails import encode_all, generate_in_worker
+
+TEMP_MEDIA = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='photo.jpg', size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'navy').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, THUMBNAIL_WORKERS=0,
+                   IMAGE_PROCESSES=0, POST_IMAGE_WIDTHS=(480, 960, 1440))
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser')
+
+    def test_upload_stores_thumbnail_url_and_size(self):
+        post = Post.objects.create(text='текст', author=self.user,
+                                   image=make_image())
+        post = Post.objects.get(id=post.id)
+        card = post.thumbnail_data['card']
+        self.assertEqual((card['width'], card['height']), (960, 339))
+        self.assertTrue(card['url'].endswith('-960.jpeg'))
+        html = render_card(post)
+        self.assertIn(f'src="{card["url"]}"', html)
+        self.assertIn('width="960" height="339"', html)
+        self.assertIn(f'srcset="{card["srcset"]["webp"]}"', html)
+
+    def test_variants_per_width_and_format(self):
+        post = Post.objects.create(text='текст', author=self.user,
+                                   image=make_image())
+        thumbnails = Post.objects.get(id=post.id).thumbnail_data
+        # 1440 шире исходника 1200 и не делается
+        self.assertEqual(
+            sorted(name.rsplit('-', 1)[1] for name in thumbnails['files']),
+            ['480.jpeg', '480.webp', '960.jpeg', '960.webp'])
+        for name in thumbnails['files']:
+            with default_storage.open(name) as file, Image.open(file) as im:
+                self.assertEqual(im.format, name.rsplit('.', 1)[1].upper())
+        self.assertEqual(thumbnails['card']['srcset']['webp'].count('w,'), 1)
+
+    @override_settings(IMAGE_PROCESSES=1)
+    def test_process_pool_encodes_same_variants(self):
+        data = make_image().read()
+        self.assertEqual(
+            [[variant[2:] for variant in variants]
+             for variants in encode_all(data, [480])],
+            [[(480, 170), (480, 170)]])
+
+    def test_removed_image_clears_thumbnails(self):
+        post = Post.objects.create(text='текст', author=self.user,
+                                   image=make_image())
+        post = Post.objects.get(id=post.id)
+        post.image = None
+        post.save()
+        self.assertEqual(Post.objects.get(id=post.id).thumbnails, '')
+
+    def test_text_edit_does_not_regenerate(self):
+        post = Post.objects.create(text='текст', author=self.user,
+                                   image=make_image())
+        post = Post.objects.get(id=post.id)
+        version = post.version
+        post.text = 'новый текст'
+        post.save()
+        # Правка текста сама поднимает версию на единицу, но не миниатюры
+        self.assertEqual(Post.objects.get(id=post.id).version, version + 1)
+
+    def test_unreadable_image_does_not_break_save(self):
+        broken = SimpleUploadedFile('broken.jpg', b'not an image',
+                                    content_type='image/jpeg')
+        for image in ('posts/missing.jpg', '/tmp/outside.jpg', broken):
+            with self.subTest(image=image):
+                with self.assertLogs('posts.thumbnails', 'WARNING'):
+                    post = Post.objects.create(text='текст',
+                                               author=self.user, image=image)
+                self.assertEqual(Post.objects.get(id=post.id).thumbnails, '')
+
+    def test_worker_failure_is_logged(self):
+        # close_all() закрыл бы соединение с транзакцией теста
+        with mock.patch('posts.thumbnails.generate',
+                        side_effect=RuntimeError('сбой')), \
+                mock.patch('posts.thumbnails.connections'):
+            with self.assertLogs('posts.thumbnails', 'ERROR') as logs:
+                generate_in_worker(1)
+        self.assertIn('сбой', logs.output[0])
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_pending_thumbnail_falls_back_to_original(self):
+        post = Post.objects.create(text='текст', author=self.user,
+                                   image=make_image())
+        post = Post.objects.get(id=post.id)
+        self.assertEqual(post.thumbnails, '')
+        self.assertIn(f'src="{post.image.url}"', render_card(post))
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertIn('card', Post.objects.get(id=post.id).thumbnail_data)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, THUMBNAIL_WORKERS=0,
+                   IMAGE_PROCESSES=0, POST_IMAGE_WIDTHS=(480, 960))
+class ThumbnailCleanupTest(TransactionTestCase):
+    # Варианты удаляются в on_commit, которого TestCase не выполняет
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser')
+
+    def test_new_image_deletes_old_variants(self):
+        posts = [Post.objects.create(text='текст', author=self.user,
+                                     image=make_image()) for _ in range(2)]
+        old_files = Post.objects.get(id=posts[0].id).thumbnail_data['files']
+        for post in posts:
+            post.image = make_image('other.jpg', size=(1000, 600))
+            post.save()
+            # Варианты общие у дубликатов и живут до последней ссылки
+            exist = all(default_storage.exists(name) for name in old_files)
+            self.assertEqual(exist, post is posts[0])
+        self.assertFalse(any(default_storage.exists(name)
+                             for name in old_files))
+
+    def test_regenerate_all_uses_new_widths(self):
+        posts = [Post.objects.create(text='текст', author=self.user,
+                                     image=make_image()) for _ in range(2)]
+        old_files = Post.objects.get(id=posts[0].id).thumbnail_data['files']
+        with override_settings(POST_IMAGE_WIDTHS=(320, 960)):
+            call_command('generate_thumbnails', '--all', stdout=StringIO())
+        for post in posts:
+            files = Post.objects.get(id=post.id).thumbnail_data['files']
+            self.assertEqual(
+                sorted(name.rsplit('-', 1)[1] for name in files),
+                ['320.jpeg', '320.webp', '960.jpeg', '960.webp'])
+            self.assertTrue(all(default_storage.exists(name)
+                                for name in files))
+        # Варианты ширины 480 больше никто не использует
+        self.assertFalse(any(default_storage.exists(name)
+                             for name in old_files if '-480.' in name))
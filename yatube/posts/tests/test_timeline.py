@@ -0,0 +1,86 @@
+from django.core.cache import cache, caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, Timeline, User, UserStats
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        cls.author = User.objects.create_user(username='testauthor')
+        cls.other = User.objects.create_user(username='otheruser')
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def tearDown(self):
+        # Множество pull-авторов пережило бы откат транзакции теста
+        caches['shared'].clear()
+
+    def get_feed(self):
+        response = self.authorized_client.get(reverse('follow_index'))
+        return list(response.context['page'])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        self.assertTrue(Timeline.objects.filter(user=self.user,
+                                                post=post).exists())
+        self.assertFalse(Timeline.objects.filter(user=self.other).exists())
+        self.assertEqual(self.get_feed(), [post])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        posts = [Post.objects.create(text=f'текст {i}', author=self.author)
+                 for i in range(3)]
+        self.authorized_client.get(
+            reverse('profile_follow', args=(self.author.username,)))
+        self.assertEqual(self.get_feed(), posts[::-1])
+        Follow.objects.create(user=self.other, author=self.author)
+        self.authorized_client.get(
+            reverse('profile_unfollow', args=(self.author.username,)))
+        self.assertEqual(self.get_feed(), [])
+        self.assertEqual(
+            Timeline.objects.filter(user=self.other).count(), 3)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_posts_are_pulled_on_read(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        Follow.objects.create(user=self.user, author=self.other)
+        pulled = Post.objects.create(text='популярный', author=self.author)
+        pushed = Post.objects.create(text='обычный', author=self.other)
+        self.assertFalse(Timeline.objects.filter(post=pulled).exists())
+        self.assertEqual(self.get_feed(), [pushed, pulled])
+
+    def is_pull(self, user):
+        return UserStats.objects.get(user=user).pull_timeline
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_mode_follows_threshold_both_ways(self):
+        late = User.objects.create_user(username='lateuser')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        first = Post.objects.create(text='до pull', author=self.author)
+        self.assertFalse(self.is_pull(self.author))
+        Follow.objects.create(user=late, author=self.author)
+        self.assertTrue(self.is_pull(self.author))
+        second = Post.objects.create(text='в pull', author=self.author)
+        self.assertFalse(Timeline.objects.filter(post=second).exists())
+        self.assertEqual(self.get_feed(), [second, first])
+        Follow.objects.get(user=self.other).delete()
+        self.assertFalse(self.is_pull(self.author))
+        for user in (self.user, late):
+            with self.subTest(user=user):
+                self.assertEqual(
+                    set(Timeline.objects.filter(user=user)
+                        .values_list('post', flat=True)),
+                    {first.id, second.id})
+        self.assertEqual(self.get_feed(), [second, first])
+        third = Post.objects.create(text='снова push', author=self.author)
+        self.assertEqual(Timeline.objects.filter(post=third).count(), 2)
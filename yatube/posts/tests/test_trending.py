@@ -0,0 +1,64 @@
+import math
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Post, User
+from ..trending import event_score, record, record_views, top_posts
+from ..view_buffer import view_buffer
+
+
+@override_settings(TRENDING_HALF_LIFE=3600, TRENDING_POST_WEIGHT=1,
+                   TRENDING_VIEW_WEIGHT=1, TRENDING_COMMENT_WEIGHT=5)
+class TrendingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        view_buffer.clear()
+        self.user = User.objects.create_user(username='testuser')
+
+    def make_post(self, text, hours_ago=0):
+        post = Post.objects.create(text=text, author=self.user)
+        pub_date = timezone.now() - timedelta(hours=hours_ago)
+        Post.objects.filter(id=post.id).update(
+            pub_date=pub_date, trending_score=event_score(1, pub_date))
+        return post
+
+    def trending_ids(self):
+        return [post.id for post in top_posts(10)]
+
+    def test_score_is_log_of_decayed_sum(self):
+        post = self.make_post('пост', hours_ago=2)
+        now = timezone.now()
+        record(post.id, 3, now - timedelta(hours=1))
+        post.refresh_from_db()
+        # К моменту now: 1 * 2**-2 + 3 * 2**-1 = 1.75
+        self.assertAlmostEqual(post.trending_score - event_score(1, now),
+                               math.log(1.75), places=6)
+
+    def test_comment_lifts_older_post(self):
+        old = self.make_post('старый', hours_ago=3)
+        new = self.make_post('новый')
+        self.assertEqual(self.trending_ids(), [new.id, old.id])
+        for _ in range(2):
+            Comment.objects.create(post=old, author=self.user, text='к')
+        self.assertEqual(self.trending_ids(), [old.id, new.id])
+
+    def test_views_flush_updates_scores(self):
+        first = self.make_post('первый')
+        second = self.make_post('второй')
+        for ip in ('1.1.1.1', '2.2.2.2', '3.3.3.3'):
+            view_buffer.record(first.id, ip)
+        view_buffer.flush()
+        self.assertEqual(self.trending_ids(), [first.id, second.id])
+        record_views({(second.id, str(i)) for i in range(10)})
+        self.assertEqual(self.trending_ids(), [second.id, first.id])
+
+    def test_trending_page(self):
+        post = self.make_post('популярный пост')
+        response = self.client.get(reverse('trending'))
+        self.assertEqual(list(response.context['page']),
+                         [Post.objects.get(id=post.id)])
+        self.assertContains(response, 'популярный пост')
@@ -0,0 +1,62 @@
+import threading
+from unittest import mock
+
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Ip, Post, User
+from ..view_buffer import view_buffer
+
+
+class ViewBufferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testuser')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+        cls.url = reverse('post', kwargs={'username': cls.user.username,
+                                          'post_id': cls.post.id})
+
+    def setUp(self):
+        view_buffer.clear()
+        self.guest_client = Client()
+
+    def tearDown(self):
+        view_buffer.clear()
+
+    def test_get_does_not_write_views(self):
+        self.guest_client.get(self.url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(len(view_buffer), 1)
+        self.assertFalse(Ip.objects.exists())
+        self.assertFalse(self.post.views.exists())
+
+    def test_flush_writes_unique_views_in_batch(self):
+        Ip.objects.create(ip='10.0.0.1')
+        for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.1'):
+            view_buffer.record(self.post.id, ip)
+        # Запись просмотров, UPDATE trending_score и две пары SAVEPOINT
+        with self.assertNumQueries(11):
+            view_buffer.flush()
+        view_buffer.record(self.post.id, '10.0.0.2')
+        view_buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 2)
+        self.assertEqual(self.post.views.count(), 2)
+        self.assertEqual(Ip.objects.count(), 2)
+
+    @override_settings(VIEW_BUFFER_SIZE=2)
+    def test_buffer_flushes_after_request_when_full(self):
+        self.guest_client.get(self.url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(len(view_buffer), 1)
+        self.guest_client.get(self.url, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(len(view_buffer), 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 2)
+
+    @override_settings(VIEW_BUFFER_TIMER=True, VIEW_BUFFER_MAX_DELAY=0.01)
+    def test_timer_flushes_without_requests(self):
+        flushed = threading.Event()
+        with mock.patch.object(view_buffer, 'flush',
+                               side_effect=flushed.set):
+            view_buffer.record(self.post.id, '10.0.0.1')
+            self.assertTrue(flushed.wait(5))
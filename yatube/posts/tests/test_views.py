@@ -1,10 +1,12 @@
 from django import forms
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.core.cache import cache
 from http import HTTPStatus
 
-from ..models import Follow, Group, Post, User
+from ..models import Comment, Follow, Group, Post, User
 
 
 class ViewsTests(TestCase):
@@ -138,9 +140,12 @@ class PaginatorTest(TestCase):
                     'page').object_list), 10)
 
     def test_second_page_contains_correctly_posts(self):
+        cache.clear()
         for pathname in self.templates_pages_names:
             with self.subTest():
-                response = self.client.get(pathname + '?page=2')
+                cursor = self.client.get(pathname).context[
+                    'page'].next_cursor
+                response = self.client.get(pathname, {'cursor': cursor})
                 self.assertEqual(len(response.context.get(
                     'page').object_list), 3)
 
@@ -258,3 +263,36 @@ class TestComments(TestCase):
         response = self.anonim.post(self.url_comment, {
             'text': self.text},)
         self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    @override_settings(COMMENTS_PAGE_SIZE=2)
+    def test_comments_are_paged_and_loaded_by_fragment(self):
+        comments = [Comment.objects.create(post=self.post,
+                                           author=self.comment_user,
+                                           text=f'комментарий {i}')
+                    for i in range(3)]
+        response = self.anonim.get(reverse(
+            'post', args=(self.user.username, self.post.id)))
+        page = response.context['comments']
+        self.assertEqual(list(page), [comments[2], comments[1]])
+        self.assertContains(response, 'Показать ещё комментарии')
+        response = self.anonim.get(
+            reverse('post_comments', args=(self.user.username, self.post.id)),
+            {'cursor': page.next_cursor})
+        self.assertEqual(list(response.context['comments']), [comments[0]])
+        self.assertNotContains(response, 'Показать ещё комментарии')
+        self.assertNotContains(response, '<html')
+
+    def test_post_page_queries_do_not_grow_with_comments(self):
+        url = reverse('post', args=(self.user.username, self.post.id))
+        counts = []
+        # Поколения областей уже в общем кеше, как на работающем сайте
+        self.authorized_user.get(url)
+        for batch in range(2):
+            Comment.objects.bulk_create(
+                Comment(post=self.post, author=self.comment_user,
+                        text=f'комментарий {batch}.{i}') for i in range(5))
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.authorized_user.get(url)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
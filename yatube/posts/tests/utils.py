@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+SHARED_CACHE_TABLE = settings.CACHES['shared']['LOCATION']
+
+
+def app_queries(context):
+    """SQL из CaptureQueriesContext без обращений к таблице общего кеша.
+
+    Точки сохранения тоже отбрасываются: DatabaseCache оборачивает в них
+    каждую запись.
+    """
+    return [query['sql'] for query in context
+            if SHARED_CACHE_TABLE not in query['sql']
+            and 'SAVEPOINT' not in query['sql']]
+
+
+class FeedQueriesMixin:
+    """Проверка, что лента стоит фиксированное число запросов."""
+
+    def count_view_queries(self, client, url):
+        # Поколения уже лежат в общем кеше, как на работающем сайте;
+        # сбрасываются только закешированные страницы
+        client.get(url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            client.get(url)
+        return len(context)
+
+    def assertFeedQueries(self, client, url, expected, add_posts):
+        """Число запросов равно expected и не растёт от add_posts()."""
+        self.assertEqual(self.count_view_queries(client, url), expected,
+                         f'{url}: число запросов при одном посте')
+        add_posts()
+        self.assertEqual(self.count_view_queries(client, url), expected,
+                         f'{url}: число запросов растёт с числом постов')
@@ -0,0 +1,180 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import F
+from PIL import Image
+
+from . import page_cache, stored_files
+from .images import (check_pixels, difference_hash, encode_variants,
+                     image_size)
+from .models import Post, StoredFile
+
+logger = logging.getLogger(__name__)
+
+# Картинку нельзя прочитать или разобрать: пост остаётся с оригиналом.
+# FileNotFoundError и UnidentifiedImageError — тоже OSError
+IMAGE_ERRORS = (OSError, SuspiciousFileOperation, Image.UnidentifiedImageError,
+                Image.DecompressionBombError)
+
+_executor = None
+_processes = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+    return _executor
+
+
+def get_process_pool():
+    # spawn, а не fork: процесс Django уже держит потоки и соединения
+    global _processes
+    with _executor_lock:
+        if _processes is None:
+            _processes = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'))
+    return _processes
+
+
+def variant_widths(source_width):
+    """Ширины не больше исходника; самая узкая — всегда."""
+    widths = sorted(settings.POST_IMAGE_WIDTHS)
+    return [width for width in widths
+            if width <= source_width or width == widths[0]]
+
+
+def encode_all(data, widths):
+    """Варианты всех ширин: параллельно в пуле процессов или здесь же."""
+    args = (settings.POST_IMAGE_ASPECT, settings.POST_IMAGE_FORMATS,
+            settings.POST_IMAGE_QUALITY)
+    if not settings.IMAGE_PROCESSES:
+        return [encode_variants(data, width, *args) for width in widths]
+    pool = get_process_pool()
+    futures = [pool.submit(encode_variants, data, width, *args)
+               for width in widths]
+    return [future.result() for future in futures]
+
+
+def read_image(image):
+    image.open('rb')
+    try:
+        return image.read()
+    finally:
+        image.close()
+
+
+def render_thumbnails(name, data):
+    """{'card': {url, width, height, srcset: {формат: srcset}}, 'files'}."""
+    size = image_size(data)
+    check_pixels(size, settings.IMAGE_MAX_PIXELS)
+    widths = variant_widths(size[0])
+    stem = os.path.splitext(name)[0]
+    # Последний формат — запасной для <img>, остальные идут в <source>
+    fallback = settings.POST_IMAGE_FORMATS[-1]
+    default_width = settings.POST_IMAGE_DEFAULT_WIDTH
+    srcset = {image_format: [] for image_format in
+              settings.POST_IMAGE_FORMATS}
+    files, card = [], None
+    for variants in encode_all(data, widths):
+        for image_format, content, width, height in variants:
+            variant = f'variants/{stem}-{width}.{image_format}'
+            if default_storage.exists(variant):
+                default_storage.delete(variant)
+            variant = default_storage.save(variant, ContentFile(content))
+            url = default_storage.url(variant)
+            files.append(variant)
+            srcset[image_format].append(f'{url} {width}w')
+            if image_format == fallback and (
+                    card is None or width <= default_width):
+                card = {'url': url, 'width': width, 'height': height}
+    card['srcset'] = {image_format: ', '.join(entries)
+                      for image_format, entries in srcset.items()}
+    return {'card': card, 'files': files}
+
+
+def delete_stale_variants(old, new):
+    # Ширины, которых больше нет в POST_IMAGE_WIDTHS: новые файлы с теми же
+    # именами уже перезаписаны, остальные удаляем после коммита
+    stale = set(old.get('files', [])) - set(new.get('files', []))
+    for variant in stale:
+        transaction.on_commit(partial(default_storage.delete, variant))
+
+
+def get_thumbnails(image, force=False):
+    """Варианты картинки: общие для всех постов с тем же файлом.
+
+    Кодирование идёт, только если у файла их ещё нет или force; файлы
+    вариантов удаляет posts.stored_files вместе с последней ссылкой на
+    картинку.
+    """
+    stored = StoredFile.objects.filter(name=image.name).first()
+    if stored is not None and stored.thumbnails and not force:
+        return stored.thumbnail_data
+    try:
+        data = read_image(image)
+        thumbnails = render_thumbnails(image.name, data)
+        phash = difference_hash(data) if settings.IMAGE_PHASH else None
+    except IMAGE_ERRORS:
+        # В синхронном режиме это post_save: сбой хранилища или битый
+        # файл не должны ронять сохранение поста
+        logger.warning('Варианты картинки %s не построены', image.name,
+                       exc_info=True)
+        return {}
+    stored_files.remember_variants(image.name, thumbnails, phash)
+    if stored is not None and stored.thumbnails:
+        delete_stale_variants(stored.thumbnail_data, thumbnails)
+    return thumbnails
+
+
+def generate(post_id, force=False):
+    post = (Post.objects.select_related('author')
+            .only('image', 'group', 'author__username')
+            .filter(id=post_id).first())
+    if post is None:
+        return
+    thumbnails = get_thumbnails(post.image, force) if post.image else {}
+    # Условие по image: пока варианты считались, картинку могли сменить
+    updated = Post.objects.filter(id=post_id, image=post.image.name).update(
+        thumbnails=json.dumps(thumbnails) if thumbnails else '',
+        version=F('version') + 1)
+    if updated:
+        page_cache.bump(*page_cache.post_scopes(post))
+
+
+def generate_in_worker(post_id):
+    try:
+        generate(post_id)
+    except Exception:
+        # Результат future никто не читает: без лога ошибка пропала бы
+        logger.exception('Миниатюры поста %s не построены', post_id)
+    finally:
+        # У потока пула свои соединения с базой: не оставляем их открытыми
+        connections.close_all()
+
+
+def schedule(post_id):
+    """Ставит варианты картинки поста в очередь пула после коммита.
+
+    THUMBNAIL_WORKERS = 0 считает их сразу в текущем потоке.
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        generate(post_id)
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(generate_in_worker, post_id))
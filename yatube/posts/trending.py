@@ -0,0 +1,68 @@
+"""Популярные посты: затухающий счёт без периодического пересчёта.
+
+Вклад события веса w в момент t к моменту now равен
+w * 2 ** (-(now - t) / TRENDING_HALF_LIFE). Общий множитель
+2 ** (-(now - EPOCH) / H) одинаков у всех постов и не влияет на порядок,
+поэтому в trending_score хранится ln(sum(w * 2 ** ((t - EPOCH) / H))).
+Новое событие прибавляется через logaddexp, а топ читается по индексу.
+"""
+import math
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from .models import Post
+
+EPOCH = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+def event_score(weight, when=None):
+    """ln(weight) плюс рост к моменту события в логарифмической шкале."""
+    when = when or timezone.now()
+    age = (when - EPOCH).total_seconds()
+    return math.log(weight) + math.log(2) * age / settings.TRENDING_HALF_LIFE
+
+
+def log_add(value):
+    """logaddexp(trending_score, value) в SQL без переполнения exp()."""
+    score = F('trending_score')
+    return Greatest(score, value) + Ln(1 + Exp(-Abs(score - value)))
+
+
+def record(post_id, weight, when=None):
+    value = Value(event_score(weight, when), output_field=FloatField())
+    Post.objects.filter(id=post_id).update(trending_score=log_add(value))
+
+
+def start(post):
+    """Начальный счёт нового поста: событие публикации."""
+    Post.objects.filter(id=post.id).update(trending_score=event_score(
+        settings.TRENDING_POST_WEIGHT, post.pub_date))
+
+
+def record_views(events):
+    """Учитывает пачку пар (post_id, ip) одним UPDATE."""
+    views = Counter(post_id for post_id, _ in events)
+    if not views:
+        return
+    now = timezone.now()
+    value = Case(
+        *(When(id=post_id, then=Value(
+            event_score(settings.TRENDING_VIEW_WEIGHT * count, now)))
+          for post_id, count in views.items()),
+        output_field=FloatField())
+    Post.objects.filter(id__in=views).update(trending_score=log_add(value))
+
+
+def log_sum(scores):
+    """ln(sum(exp(score))) без переполнения: сложение счётов."""
+    peak = max(scores)
+    return peak + math.log(sum(math.exp(score - peak) for score in scores))
+
+
+def top_posts(limit):
+    return Post.objects.feed().order_by('-trending_score', '-id')[:limit]
@@ -9,6 +9,11 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group'),
     path('new_group/', views.group_create, name='group_create'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('trending/', views.trending, name='trending'),
+    path('search/', views.search, name='search'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('export/posts/', views.export_posts, name='export_posts'),
+    path('export/comments/', views.export_comments, name='export_comments'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/follow/',
          views.profile_follow,
@@ -19,6 +24,9 @@ urlpatterns = [
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/',
          views.edit_post, name='edit_post'),
+    path('<str:username>/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
     path('<str:username>/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
@@ -0,0 +1,47 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, UserStats
+
+COUNTERS = {
+    'post_count': (Post.objects, 'author'),
+    'follower_count': (Follow.objects, 'author'),
+    'following_count': (Follow.objects, 'user'),
+    'comments_received': (Comment.objects, 'post__author'),
+}
+
+
+def change(users, delta, *fields):
+    """Сдвигает счётчики пользователей из queryset или списка id."""
+    stats = UserStats.objects.filter(user__in=users)
+    stats.update(**{field: Greatest(F(field) + delta, 0)
+                    for field in fields})
+
+
+def discount(queryset, lookup, field):
+    """Вычитает из field каждого пользователя lookup число его строк
+    queryset — одним UPDATE, например до каскадного удаления строк."""
+    UserStats.objects.filter(user__in=queryset.values(lookup)).update(
+        **{field: Greatest(F(field) - count_per_user(queryset, lookup), 0)})
+
+
+def count_per_user(queryset, lookup):
+    totals = (queryset.filter(**{lookup: OuterRef('user')}).order_by()
+              .values(lookup).annotate(total=Count('*')).values('total'))
+    return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+
+def real_counts():
+    return {field: count_per_user(queryset, lookup)
+            for field, (queryset, lookup) in COUNTERS.items()}
+
+
+def get_stats(user):
+    """Строка счётчиков пользователя; пропавшая создаётся и пересчитывается."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        UserStats.objects.get_or_create(user=user)
+        UserStats.objects.filter(user=user).update(**real_counts())
+        user.stats = UserStats.objects.get(user=user)
+        return user.stats
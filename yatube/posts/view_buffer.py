@@ -0,0 +1,130 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Ip, Post
+from .sketches import write_sketches
+from .trending import record_views
+
+logger = logging.getLogger(__name__)
+
+
+def write_views(events):
+    """Пачкой записывает пары (post_id, ip) и увеличивает view_count.
+
+    Возвращает id существующих постов из пачки.
+    """
+    Through = Post.views.through
+    with transaction.atomic():
+        post_ids = set(Post.objects.filter(
+            id__in={post_id for post_id, _ in events}
+        ).order_by().values_list('id', flat=True))
+        addresses = {ip for post_id, ip in events if post_id in post_ids}
+        Ip.objects.bulk_create((Ip(ip=ip) for ip in addresses),
+                               ignore_conflicts=True)
+        ip_ids = dict(Ip.objects.filter(ip__in=addresses)
+                      .values_list('ip', 'id'))
+        existing = set(Through.objects.filter(
+            post_id__in=post_ids, ip_id__in=ip_ids.values()
+        ).values_list('post_id', 'ip_id'))
+        pairs = {(post_id, ip_ids[ip]) for post_id, ip in events
+                 if post_id in post_ids} - existing
+        Through.objects.bulk_create(
+            (Through(post_id=post_id, ip_id=ip_id)
+             for post_id, ip_id in pairs),
+            ignore_conflicts=True)
+        added = Counter(post_id for post_id, _ in pairs)
+        if added:
+            Post.objects.filter(id__in=added).update(
+                view_count=F('view_count') + Case(
+                    *(When(id=post_id, then=Value(count))
+                      for post_id, count in added.items()),
+                    output_field=IntegerField()))
+    return post_ids
+
+
+class ViewBuffer:
+    """Копит просмотры в памяти процесса, чтобы GET-запросы ничего не писали.
+
+    Буфер сбрасывается после ответа (request_finished), когда набралось
+    VIEW_BUFFER_SIZE событий или самое старое ждёт дольше
+    VIEW_BUFFER_MAX_DELAY секунд, а также при остановке процесса. Если
+    запросов больше нет, окно закрывает таймер, заведённый первым
+    событием. При аварийном падении теряется не больше одного окна.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = set()
+        self._started = None
+
+    def __len__(self):
+        return len(self._events)
+
+    def record(self, post_id, ip):
+        with self._lock:
+            self._events.add((post_id, ip))
+            if self._started is None:
+                self._started = time.monotonic()
+                self._start_timer()
+
+    def _start_timer(self):
+        if not settings.VIEW_BUFFER_TIMER:
+            return
+        timer = threading.Timer(settings.VIEW_BUFFER_MAX_DELAY,
+                                self.flush_in_timer)
+        timer.daemon = True
+        timer.start()
+
+    def flush_in_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            # События вернулись в буфер и ждут следующего окна
+            logger.exception('Просмотры не записаны')
+        finally:
+            # У потока таймера свои соединения с базой
+            connections.close_all()
+
+    def is_due(self):
+        started = self._started
+        return started is not None and (
+            len(self._events) >= settings.VIEW_BUFFER_SIZE
+            or time.monotonic() - started >= settings.VIEW_BUFFER_MAX_DELAY)
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, set()
+            self._started = None
+        if not events:
+            return
+        try:
+            with transaction.atomic():
+                if settings.VIEW_COUNT_MODE == 'approximate':
+                    post_ids = write_sketches(events)
+                else:
+                    post_ids = write_views(events)
+                record_views({event for event in events
+                              if event[0] in post_ids})
+        except Exception:
+            with self._lock:
+                self._events |= events
+                if self._started is None:
+                    self._started = time.monotonic()
+                    self._start_timer()
+            raise
+
+    def clear(self):
+        with self._lock:
+            self._events = set()
+            self._started = None
+
+
+view_buffer = ViewBuffer()
+atexit.register(view_buffer.flush)
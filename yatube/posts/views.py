@@ -1,11 +1,31 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
-from .forms import CommentForm, PostForm, GroupForm
-from .models import Follow, Group, Post, User, Ip, Comment
+from . import autocomplete as prefix_index
+from .cards import attach_cards
+from .export import CONTENT_TYPES, export
+from .follow_graph import is_following
+from .forms import CommentForm, ExportForm, PostForm, GroupForm
+from .models import (Comment, Follow, Group, GroupStats, Post, Recommendation,
+                     User)
+from .page_cache import cache_page_generations, conditional_generations
+from .paginator import (CachedCountPaginator, CommentPaginator,
+                        CursorPaginator)
+from .search import SearchPaginator
+from .timeline import TimelinePaginator
+from .trending import top_posts
+from .user_stats import get_stats
+from .view_buffer import view_buffer
+
+
+def get_suggestions(user):
+    """Рекомендации «кого почитать» одним чтением по (user, rank)."""
+    if not user.is_authenticated:
+        return []
+    return (Recommendation.objects.filter(user=user)
+            .select_related('author').only('author', 'author__username'))
 
 
 def get_client_ip(request):
@@ -17,22 +37,23 @@ def get_client_ip(request):
     return ip
 
 
-@cache_page(20)
+@cache_page_generations(lambda request: ('index', 'groups'))
 def index(request):
-    post_list = Post.objects.select_related('group').all()
-    paginator = Paginator(post_list, settings.PAGINATOR_YA)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    paginator = CursorPaginator(post_list, settings.PAGINATOR_YA)
+    page = paginator.get_page(request.GET.get('cursor'))
+    attach_cards(page)
     return render(request, 'index.html',
                   {'page': page, 'paginator': paginator})
 
 
+@cache_page_generations(lambda request, slug: (f'group:{slug}', 'groups'))
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, settings.PAGINATOR_YA)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = group.posts.feed()
+    paginator = CursorPaginator(posts, settings.PAGINATOR_YA)
+    page = paginator.get_page(request.GET.get('cursor'))
+    attach_cards(page)
     context = {
         'group': group,
         'posts': posts,
@@ -42,13 +63,76 @@ def group_posts(request, slug):
     return render(request, 'group.html', context)
 
 
+def trending(request):
+    posts = list(top_posts(settings.TRENDING_SIZE))
+    attach_cards(posts)
+    return render(request, 'trending.html', {'page': posts})
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, settings.PAGINATOR_YA)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return render(request, 'posts/search.html',
+                  {'query': query, 'page': page, 'paginator': paginator})
+
+
+def autocomplete(request):
+    query = request.GET.get('q', '').strip()
+    limit = settings.AUTOCOMPLETE_LIMIT
+    if not query:
+        return JsonResponse({'users': [], 'groups': []})
+    return JsonResponse({
+        'users': prefix_index.users.search(query, limit),
+        'groups': prefix_index.groups.search(query, limit),
+    })
+
+
+def stream_export(request, kind):
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    options = form.cleaned_data
+    file_format, compress = options['format'], options['gzip']
+    filename = f'{kind}.{file_format}' + ('.gz' if compress else '')
+    response = StreamingHttpResponse(
+        export((kind,), file_format, options, compress),
+        content_type=('application/gzip' if compress else
+                      f'{CONTENT_TYPES[file_format]}; charset=utf-8'))
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def export_posts(request):
+    return stream_export(request, 'posts')
+
+
+@login_required
+def export_comments(request):
+    return stream_export(request, 'comments')
+
+
+# Сортировки каталога: activity и size идут по индексам GroupStats
+GROUP_ORDERINGS = {
+    'title': ('group__title',),
+    'activity': ('-last_post_date', 'group_id'),
+    'size': ('-post_count', 'group_id'),
+}
+
+
 def group_list(request):
-    group_lists = Group.objects.all()
-    paginator = Paginator(group_lists, settings.PAGINATOR_YA)
+    sort = request.GET.get('sort')
+    if sort not in GROUP_ORDERINGS:
+        sort = 'title'
+    group_lists = GroupStats.objects.select_related('group').order_by(
+        *GROUP_ORDERINGS[sort])
+    paginator = CachedCountPaginator(group_lists, settings.PAGINATOR_YA)
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
     return render(request, 'posts/group_list.html', {
-        'group_list': group_lists, 'page': page, 'paginator': paginator})
+        'group_list': group_lists, 'page': page, 'paginator': paginator,
+        'sort': sort})
 
 
 @login_required
@@ -62,37 +146,45 @@ def group_create(request):
     return redirect('group_list')
 
 
+@cache_page_generations(
+    lambda request, username: (f'profile:{username}', 'groups',
+                               'recommendations'))
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author)
-    paginator = Paginator(post_list, settings.PAGINATOR_YA)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = request.user.is_authenticated and (
-        Follow.objects.filter(user=request.user,
-                              author=author).exists())
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    post_list = author.posts.feed()
+    paginator = CursorPaginator(post_list, settings.PAGINATOR_YA)
+    page = paginator.get_page(request.GET.get('cursor'))
+    attach_cards(page)
+    following = is_following(request.user, author.id)
     context = {
         'author': author,
         'page': page,
-        'post_count': post_list.count(),
+        'post_count': get_stats(author).post_count,
         'paginator': paginator,
-        'following': following
+        'following': following,
+        'suggestions': get_suggestions(request.user),
     }
     return render(request, 'posts/profile.html', context)
 
 
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post.objects.select_related('author'),
+    response = post_page(request, username, post_id)
+    # Повторная проверка с ответом 304 — тоже просмотр
+    if response.status_code in (200, 304):
+        view_buffer.record(post_id, get_client_ip(request))
+    return response
+
+
+@conditional_generations(
+    lambda request, username, post_id: (f'profile:{username}', 'groups'),
+    timeout=settings.POST_ETAG_TIMEOUT)
+def post_page(request, username, post_id):
+    post = get_object_or_404(Post.objects.select_related('author__stats'),
                              id=post_id, author__username=username)
-    ip = get_client_ip(request)
-    if Ip.objects.filter(ip=ip).exists():
-        post.views.add(Ip.objects.get(ip=ip))
-    else:
-        Ip.objects.create(ip=ip)
-        post.views.add(Ip.objects.get(ip=ip))
-    post_count = Post.objects.filter(author=post.author).count()
+    post_count = get_stats(post.author).post_count
     form = CommentForm()
-    comments = post.comments.all()
+    comments = get_comment_page(post, request.GET.get('cursor'))
     context = {
         'author': post.author,
         'post': post,
@@ -103,6 +195,25 @@ def post_view(request, username, post_id):
     return render(request, 'posts/post.html', context)
 
 
+def get_comment_page(post, cursor):
+    paginator = CommentPaginator(post.comments.thread(),
+                                 settings.COMMENTS_PAGE_SIZE)
+    return paginator.get_page(cursor)
+
+
+@conditional_generations(
+    lambda request, username, post_id: (f'profile:{username}',))
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(
+        Post.objects.select_related('author').only('author',
+                                                   'author__username'),
+        id=post_id, author__username=username)
+    comments = get_comment_page(post, request.GET.get('cursor'))
+    return render(request, 'includes/comment_list.html',
+                  {'post': post, 'comments': comments})
+
+
 @login_required
 def new_post(request):
     form = PostForm(request.POST or None,
@@ -150,10 +261,10 @@ def server_error(request):
 
 @login_required()
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post,
+    post = get_object_or_404(Post.objects.select_related('author'),
                              id=post_id,
                              author__username=username)
-    comments = post.comments.all()
+    comments = get_comment_page(post, None)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -167,13 +278,12 @@ def add_comment(request, username, post_id):
 
 @login_required
 def follow_index(request):
-    user = request.user
-    post_list = Post.objects.filter(author__following__user=user)
-    paginator = Paginator(post_list, settings.PAGINATOR_YA)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator = TimelinePaginator(request.user, settings.PAGINATOR_YA)
+    page = paginator.get_page(request.GET.get('cursor'))
+    attach_cards(page)
     return render(request, 'follow.html',
-                  {'page': page})
+                  {'page': page,
+                   'suggestions': get_suggestions(request.user)})
 
 
 @login_required
@@ -189,7 +299,7 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(author=author).delete()
+    Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('profile', username=username)
 
 
@@ -0,0 +1,14 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import get_card
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post):
+    html = getattr(post, 'card_html', None)
+    if html is None:
+        html = get_card(post)
+    return mark_safe(html)
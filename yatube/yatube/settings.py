@@ -40,7 +40,7 @@ ALLOWED_HOSTS = [
 INSTALLED_APPS = [
     'about',
     'users',
-    'posts',
+    'posts.apps.PostsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -79,7 +79,8 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
-            'libraries': {'user_filters': 'templatetags.user_filters', },
+            'libraries': {'user_filters': 'templatetags.user_filters',
+                          'post_cards': 'templatetags.post_cards', },
         },
     },
 ]
@@ -154,13 +155,119 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 PAGINATOR_YA = 10
-
+# Комментариев на страницу под постом и в API
+COMMENTS_PAGE_SIZE = 20
+
+# default — кеш процесса: страницы, карточки. В shared — то, что должно
+# быть общим для всех воркеров: поколения областей страниц
+# (posts.page_cache), по которым и сбрасываются закешированные страницы,
+# и графы подписок (posts.follow_graph).
+# Здесь это таблица базы (её создаёт миграция posts), и цена честная:
+# каждая отдача страницы, в том числе ответ 304, читает поколения одним
+# SQL-запросом, а первое чтение вытесненного поколения пишет его (с
+# COUNT(*) для отсечения старых строк). Без запросов к базе и с
+# атомарным incr — только на Memcached или Redis: в продакшене shared
+# должен смотреть туда
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'shared_cache',
+    },
 }
 
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
+
+# Лента подписок: авторам с большим числом подписчиков посты не
+# раскладываются по лентам при публикации, а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_PULL_AUTHORS_TTL = 300
+
+# Просмотры копятся в памяти и пишутся пачками: не чаще чем раз в
+# VIEW_BUFFER_MAX_DELAY секунд или по достижении VIEW_BUFFER_SIZE событий.
+# Без запросов окно закрывает таймер (VIEW_BUFFER_TIMER). Это же окно —
+# максимум просмотров, теряемых при падении процесса
+VIEW_BUFFER_SIZE = 500
+VIEW_BUFFER_MAX_DELAY = 5
+VIEW_BUFFER_TIMER = True
+
+# 'exact' — просмотры хранятся парами пост/IP, 'approximate' — в
+# HyperLogLog-скетче фиксированного размера (2 ** VIEW_SKETCH_PRECISION байт)
+VIEW_COUNT_MODE = 'exact'
+VIEW_SKETCH_PRECISION = 12
+
+# Карточки постов кешируются по (id, version); версия растёт при правке
+# поста или сообщества и при добавлении/удалении комментария
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Ленты index, group и profile кешируются до смены поколения их областей
+# (см. posts.page_cache); таймаут — лишь верхняя граница жизни страницы.
+# Просмотры поколений не меняют: счётчики просмотров в закешированной
+# ленте отстают от базы до PAGE_CACHE_TIMEOUT
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+# Они же и страница поста отдаются с ETag по тем же поколениям (ответ 304
+# без запросов к базе данных, кроме чтения поколений из CACHES['shared']).
+# Счётчик просмотров поколений не ведёт, поэтому ETag страницы поста
+# меняется хотя бы раз в POST_ETAG_TIMEOUT секунд
+POST_ETAG_TIMEOUT = 60
+
+# Номерной пагинатор кеширует COUNT(*) до первой записи в модель
+PAGINATOR_COUNT_TIMEOUT = 60 * 60
+
+# Сколько пользователей и сообществ отдаёт автодополнение на один запрос
+AUTOCOMPLETE_LIMIT = 10
+# Как часто поиск сверяет индекс с поколением модели в общем кеше:
+# столько секунд пользователи и сообщества из других процессов могут
+# не находиться
+AUTOCOMPLETE_CHECK_INTERVAL = 5
+
+# Окно «активных авторов» в каталоге сообществ, дней
+GROUP_ACTIVE_DAYS = 7
+
+# Подписки пользователя кешируются массивом id в CACHES['shared'] до
+# первой подписки/отписки
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+
+# Рекомендации «кого почитать» (команда recommend_authors): сколько авторов
+# хранить на пользователя, вес совместных подписок относительно друзей
+# друзей и порог подписчиков, выше которого автор не сближает читателей
+RECOMMENDATIONS_TOP_K = 10
+RECOMMENDATIONS_COFOLLOW_WEIGHT = 0.5
+RECOMMENDATIONS_MAX_FOLLOWERS = 1000
+
+# Популярное: вклад события вдвое слабеет за TRENDING_HALF_LIFE секунд;
+# веса публикации, просмотра и комментария; длина ленты
+TRENDING_HALF_LIFE = 60 * 60 * 12
+TRENDING_POST_WEIGHT = 1
+TRENDING_VIEW_WEIGHT = 1
+TRENDING_COMMENT_WEIGHT = 5
+TRENDING_SIZE = 50
+
+# Варианты картинки поста считаются при загрузке: THUMBNAIL_WORKERS
+# потоков (0 — сразу в запросе) раздают кодирование IMAGE_PROCESSES
+# процессам (0 — в том же потоке). Для каждой ширины POST_IMAGE_WIDTHS
+# кадр POST_IMAGE_ASPECT кодируется во все POST_IMAGE_FORMATS; последний
+# формат — запасной для браузеров без WebP. Шаблоны читают готовые
+# url, srcset и размеры из Post.thumbnails
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_DEFAULT_WIDTH = 960
+POST_IMAGE_ASPECT = (960, 339)
+POST_IMAGE_FORMATS = ('webp', 'jpeg')
+POST_IMAGE_QUALITY = 80
+IMAGE_PROCESSES = 2
+# Больше пикселей (по заголовку, до декодирования) не принимаем
+IMAGE_MAX_PIXELS = 50 * 10 ** 6
+
+# Перцептивный хеш загруженных картинок: похожие (не дальше
+# IMAGE_PHASH_DISTANCE бит из 64, не больше 3 для поиска по полосам)
+# отмечаются в StoredFile.similar_to
+IMAGE_PHASH = False
+IMAGE_PHASH_DISTANCE = 3
+THUMBNAIL_WORKERS = 2
+
+# Выгрузка постов и комментариев читает базу кусками по столько строк
+EXPORT_CHUNK_SIZE = 2000
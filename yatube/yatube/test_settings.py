@@ -0,0 +1,11 @@
+"""Настройки тестов: всё как в yatube.settings, кроме фоновых потоков.
+
+Кеши и база те же, что в поставке, поэтому assertNumQueries считает и
+запросы к CACHES['shared'].
+"""
+from .settings import *  # noqa: F401,F403
+
+# Пул миниатюр писал бы в SQLite одновременно с тестом и в уже удалённый
+# MEDIA_ROOT, а таймер буфера просмотров — в базу посреди чужого теста
+THUMBNAIL_WORKERS = IMAGE_PROCESSES = 0
+VIEW_BUFFER_TIMER = False